@@ -0,0 +1,217 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import h3
+from shapely.geometry import Polygon, shape
+
+import check_overlap_UNEP_geojson as overlap
+
+
+def load_geometries(geojson_file, limit=None):
+    geometries = []
+    for feature in overlap.iter_geojson_features(geojson_file):
+        if not feature.get('geometry'):
+            continue
+        try:
+            geometries.append(shape(feature['geometry']))
+        except Exception:
+            continue
+        if limit and len(geometries) >= limit:
+            break
+    return geometries
+
+def cell_polygon(cell):
+    return Polygon([(lng, lat) for lat, lng in h3.cell_to_boundary(cell)])
+
+def benchmark_h3_coverage(geojson_file, limit=1000):
+    """Compare speed and recall of the H3 coverage modes in get_h3_indices().
+
+    Ground truth is every candidate cell whose hexagon really intersects the
+    geometry, so recall is the share of truly intersecting cells a mode finds.
+    """
+    geometries = load_geometries(geojson_file, limit)
+    print(f"Benchmarking H3 coverage on {len(geometries)} geometries (res {overlap.H3_RESOLUTION})")
+
+    results = {}
+    for mode in overlap.H3_COVERAGE_MODES:
+        start = time.perf_counter()
+        cells = [overlap.get_h3_indices(geom, mode) for geom in geometries]
+        results[mode] = (time.perf_counter() - start, cells)
+
+    truth = []
+    for geom, *candidates in zip(geometries, *(cells for _, cells in results.values())):
+        candidate_cells = set().union(*candidates)
+        truth.append({cell for cell in candidate_cells if cell_polygon(cell).intersects(geom)})
+    total_true = sum(len(cells) for cells in truth) or 1
+
+    for mode, (elapsed, cells) in results.items():
+        found = sum(len(c & t) for c, t in zip(cells, truth))
+        missed = sum(1 for c, t in zip(cells, truth) if t - c)
+        print(f"  {mode:<9} {elapsed:8.3f}s  {len(geometries) / elapsed:10.1f} geoms/s  "
+              f"recall {found / total_true:7.2%}  geometries with missed cells: {missed}")
+
+def benchmark_h3_index(wdpa_file, projects_file, resolutions=(5, 7, 8), limit=5000):
+    """Compare the fixed resolution-5 PA index with compacted multi-resolution indexes.
+
+    Reports index size (postings), build time, candidates per project and
+    how many of those candidates really intersect the project.
+    """
+    projects = load_geometries(projects_file, limit)
+    configs = [('fixed', overlap.H3_RESOLUTION)] + [('multires', r) for r in resolutions]
+    saved = overlap.H3_INDEX_MODE, overlap.H3_RESOLUTION
+    print(f"Benchmarking H3 indexes with {len(projects)} projects")
+    try:
+        for mode, resolution in configs:
+            overlap.H3_INDEX_MODE, overlap.H3_RESOLUTION = mode, resolution
+            start = time.perf_counter()
+            store = overlap.ProtectedAreaStore.from_areas(*overlap.read_protected_areas(wdpa_file))
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            candidates = [store.candidate_ids(overlap.get_h3_indices(geom)) for geom in projects]
+            lookup = time.perf_counter() - start
+            total = sum(len(c) for c in candidates)
+            hits = sum(store.geometry(pa_id).intersects(geom)
+                       for geom, ids in zip(projects, candidates) for pa_id in ids.tolist())
+            print(f"  {mode:<8} res {resolution:<2} postings {len(store.cell_area_ids):>10,}  "
+                  f"build {build:7.2f}s  lookup {lookup:6.2f}s  "
+                  f"candidates/project {total / max(len(projects), 1):6.2f}  "
+                  f"true hits {hits / max(total, 1):6.1%}")
+    finally:
+        overlap.H3_INDEX_MODE, overlap.H3_RESOLUTION = saved
+
+def available_json_backends():
+    backends = []
+    for name in overlap.IJSON_BACKENDS:
+        try:
+            overlap.get_ijson_backend(name)
+            backends.append(name)
+        except ImportError:
+            pass
+    for name in overlap.LINE_BACKENDS:
+        try:
+            overlap.get_line_parser(name)
+            backends.append(name)
+        except ImportError:
+            pass
+    return backends
+
+def benchmark_ingest(geojson_file, build_shapes=False):
+    """Features/sec for every installed JSON backend.
+
+    ijson backends read the FeatureCollection; the line-based parsers read a
+    temporary GeoJSONSeq copy of it.
+    """
+    seq_file = None
+    if not overlap.is_geojsonseq(geojson_file):
+        fd, seq_file = tempfile.mkstemp(suffix='.geojsonl')
+        with os.fdopen(fd, 'w') as f:
+            for feature in overlap.iter_geojson_features(geojson_file):
+                f.write(json.dumps(feature) + '\n')
+
+    print(f"Benchmarking GeoJSON ingest of {geojson_file}" + (" (including shape())" if build_shapes else ""))
+    try:
+        for backend in available_json_backends():
+            is_line_backend = backend in overlap.LINE_BACKENDS
+            if overlap.is_geojsonseq(geojson_file) and not is_line_backend:
+                continue
+            path = seq_file if is_line_backend and seq_file else geojson_file
+            start = time.perf_counter()
+            count = 0
+            for feature in overlap.iter_geojson_features(path, backend):
+                if build_shapes and feature.get('geometry'):
+                    shape(feature['geometry'])
+                count += 1
+            elapsed = time.perf_counter() - start
+            print(f"  {backend:<11} {'GeoJSONSeq' if is_line_backend else 'FeatureCollection':<17} "
+                  f"{count / elapsed:12.0f} features/s  ({count} in {elapsed:.2f}s)")
+    finally:
+        if seq_file:
+            os.remove(seq_file)
+
+def benchmark_spatial_sort(wdpa_file, projects_file, modes=overlap.SPATIAL_SORT_MODES, engine='h3',
+                           prepare='lazy', full_overlap=False, repeat=1):
+    """Projects/sec of the overlap check for each --spatial-sort mode on one ingested table.
+
+    Also reports how often a PA geometry had to be decoded (misses of the
+    store's geometry LRU) and whether each mode wrote the same output as
+    the first one. Progress output of the runs is suppressed.
+    """
+    projects = overlap.ingest_projects(projects_file)
+    store = overlap.load_protected_areas(wdpa_file, overlap.get_target_countries(projects.countries))
+    decodes = [0]
+    get_wkb = store.get_wkb
+
+    def counting_get_wkb(pa_id):
+        decodes[0] += 1
+        return get_wkb(pa_id)
+    store.get_wkb = counting_get_wkb
+
+    print(f"Benchmarking spatial sort on {len(projects)} projects and {len(store)} protected areas "
+          f"(engine {engine}, prepare {prepare}{', full overlap' if full_overlap else ''})")
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in modes:
+            path = os.path.join(tmp_dir, f'{mode}.csv')
+            best = None
+            for _ in range(repeat):
+                store._geometries.clear()
+                decodes[0] = 0
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    overlap.process_projects_to_csv(projects, store, path, engine=engine, prepare=prepare,
+                                                    full_overlap=full_overlap, spatial_sort=mode)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            reference = reference or digest
+            print(f"  {mode:<8} {best:8.2f}s  {len(projects) / best:10.1f} projects/s  "
+                  f"PA decodes {decodes[0]:>9,}  output {'same' if digest == reference else 'DIFFERENT'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for check_overlap_UNEP_geojson.py")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    coverage = subparsers.add_parser('h3-coverage', help="polyfill vs point-sampling H3 coverage")
+    coverage.add_argument('geojson')
+    coverage.add_argument('--limit', type=int, default=1000)
+
+    index = subparsers.add_parser('h3-index', help="fixed res-5 vs multi-resolution compacted PA index")
+    index.add_argument('wdpa')
+    index.add_argument('projects')
+    index.add_argument('--resolutions', type=int, nargs='+', default=[5, 7, 8])
+    index.add_argument('--limit', type=int, default=5000)
+
+    ingest = subparsers.add_parser('ingest', help="features/sec for each JSON parsing backend")
+    ingest.add_argument('geojson')
+    ingest.add_argument('--shapes', action='store_true', help="also build shapely geometries")
+
+    spatial = subparsers.add_parser('spatial-sort', help="overlap check throughput with and without spatial sorting")
+    spatial.add_argument('wdpa')
+    spatial.add_argument('projects')
+    spatial.add_argument('--modes', nargs='+', choices=overlap.SPATIAL_SORT_MODES, default=list(overlap.SPATIAL_SORT_MODES))
+    spatial.add_argument('--engine', choices=overlap.JOIN_ENGINES, default='h3')
+    spatial.add_argument('--prepare', choices=overlap.PREPARE_MODES, default='lazy')
+    spatial.add_argument('--full-overlap', action='store_true')
+    spatial.add_argument('--repeat', type=int, default=1, help="Runs per mode; the fastest is reported")
+
+    args = parser.parse_args()
+    if args.benchmark == 'h3-coverage':
+        benchmark_h3_coverage(args.geojson, args.limit)
+    elif args.benchmark == 'h3-index':
+        benchmark_h3_index(args.wdpa, args.projects, args.resolutions, args.limit)
+    elif args.benchmark == 'ingest':
+        benchmark_ingest(args.geojson, args.shapes)
+    elif args.benchmark == 'spatial-sort':
+        benchmark_spatial_sort(args.wdpa, args.projects, args.modes, args.engine, args.prepare,
+                               args.full_overlap, args.repeat)
+
+if __name__ == "__main__":
+    main()
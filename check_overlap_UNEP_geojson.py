@@ -1,10 +1,37 @@
+import argparse
+import collections
+import difflib
+import functools
+import gc
+import hashlib
+import heapq
+import itertools
 import json
-from shapely.geometry import shape, Point
+import multiprocessing
+import os
+import tempfile
+import unicodedata
+from shapely.geometry import shape, Point, Polygon
+from shapely import STRtree
+import shapely
 import ijson
 import h3
 import numpy as np
 import pandas as pd
 from decimal import Decimal
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet output is optional
+    pyarrow = None
+try:
+    import orjson
+except ImportError:  # optional fast parser for GeoJSONSeq input
+    orjson = None
+try:
+    import simdjson
+except ImportError:  # optional fast parser for GeoJSONSeq input
+    simdjson = None
 # Add country name to ISO3 mapping
 COUNTRY_TO_ISO3 = {
     # North America
@@ -349,9 +376,86 @@ COUNTRY_TO_ISO3 = {
     'Republic of South Sudan': 'SSD'
 }
 
+# UN/ISO short names and other spellings seen in ledger exports; matched after
+# normalisation, so case, accents and punctuation variants need no entry.
+COUNTRY_ALIASES = {
+    'Viet Nam': 'VNM',
+    'Brasil': 'BRA',
+    'Türkiye': 'TUR',
+    'Cabo Verde': 'CPV',
+    'Holy See': 'VAT',
+    'Lao PDR': 'LAO',
+    'Bolivia (Plurinational State of)': 'BOL',
+    'Venezuela (Bolivarian Republic of)': 'VEN',
+    'Iran (Islamic Republic of)': 'IRN',
+    'Tanzania, United Republic of': 'TZA',
+    'United Republic of Tanzania': 'TZA',
+    'Korea, Republic of': 'KOR',
+    "Korea, Democratic People's Republic of": 'PRK',
+    'Moldova, Republic of': 'MDA',
+    'Republic of Moldova': 'MDA',
+    'Micronesia (Federated States of)': 'FSM',
+    'Congo, The Democratic Republic of the': 'COD',
+    'DR Congo': 'COD',
+    'Palestine, State of': 'PSE',
+    'Taiwan, Province of China': 'TWN',
+    'U.S.A.': 'USA',
+    'U.S.': 'USA',
+}
+COUNTRY_FUZZY_CUTOFF = 0.85  # difflib ratio needed to accept a misspelt country name
+
 H3_RESOLUTION = 5  # ~8km hexes
+H3_COVERAGE_MODES = ('polyfill', 'sample')
+H3_COVERAGE_MODE = 'polyfill'
+H3_INDEX_MODES = ('fixed', 'multires')
+H3_INDEX_MODE = 'fixed'  # multires: PA cells compacted to mixed resolutions
+H3_CLASSIFY_INTERIOR = False  # tag PA cells lying entirely inside the PA
+INTERIOR_MARGIN_DEG = 1e-4  # ~11 m; absorbs great-circle vs planar hexagon edges
+
+IJSON_BACKENDS = ('yajl2_c', 'yajl2_cffi', 'yajl2', 'python')  # fastest first
+LINE_BACKENDS = ('orjson', 'simdjson', 'json')  # fastest first
+JSON_BACKENDS = ('auto',) + IJSON_BACKENDS + LINE_BACKENDS
+JSON_BACKEND = 'auto'
+GEOJSONSEQ_EXTENSIONS = ('.geojsonl', '.geojsons', '.geojsonseq', '.ndjson', '.jsonl')
+
+PA_ATTRIBUTES = ['WDPAID', 'NAME', 'DESIG_ENG', 'IUCN_CAT', 'MARINE', 'STATUS', 'STATUS_YR', 'ISO3']
+RESULT_COLUMNS = ['id'] + [f'PA_{attr}' for attr in PA_ATTRIBUTES] + ['unep_overlap']
+FULL_OVERLAP_COLUMNS = RESULT_COLUMNS + ['project_hectares', 'overlap_hectares', 'overlap_percent']
+WGS84_A = 6378137.0
+WGS84_E = 0.0818191908426215  # first eccentricity
+JOIN_ENGINES = ('h3', 'strtree')
+PROJECT_CHUNK_SIZE = 10000
+WORKER_CHUNK_SIZE = 1000  # smaller chunks keep a process pool evenly loaded
+PREPARE_MODES = ('off', 'lazy', 'eager')
+SPATIAL_SORT_MODES = ('off', 'hilbert', 'h3')
+SPATIAL_SORT_WINDOW = 100000  # projects reordered (and results held for restoring order) at a time
+HILBERT_ORDER = 16  # Hilbert curve over a 65536 x 65536 lon/lat grid (~600 m cells)
+PREPARED_CACHE_SIZE = 2048  # prepared PA geometries kept by the lazy LRU
+GEOMETRY_CACHE_SIZE = 4096  # decoded PA geometries kept by ProtectedAreaStore
+OUTPUT_FORMATS = ('csv', 'parquet')
+RESULT_BATCH_SIZE = 10000  # rows held in memory before the writer flushes
+CONTAINED = object()  # get_overlap_hectares result when the project lies wholly inside the PA
+PARQUET_TYPES = {
+    'PA_WDPAID': 'int64',
+    'PA_STATUS_YR': 'int64',
+    'unep_overlap': 'bool',
+    'project_hectares': 'float64',
+    'overlap_hectares': 'float64',
+    'overlap_percent': 'float64',
+}  # every other column is written as string
+FRAME_TYPES = {'int64': 'Int64', 'bool': 'boolean', 'float64': 'float64'}  # nullable in-memory dtypes
+
+# Read-only state for pool workers; set before the fork so children share it copy-on-write.
+_worker_context = {}
+PA_CACHE_DIR = "geojson/pa_index_cache"
+PA_CACHE_VERSION = 3  # bump when the on-disk layout, H3 coverage or attribute values change
+BBOX_PREFILTER_MARGIN_DEG = 1e-6  # absorbs rounding in bbox members written by other tools
+PA_SHARD_INDEX = "index.json"  # written by partition_wdpa.py next to the per-ISO3 shards
+RESULT_STORE_VERSION = 2  # bump when stored result rows change meaning
 
 def to_jsonable(x):
+    if isinstance(x, float) and x.is_integer():
+        return int(x)  # whole-number doubles, as the Decimal values ijson used to give
     if x is None or isinstance(x, (bool, int, float, str)):
         return x
     if isinstance(x, Decimal):
@@ -371,8 +475,60 @@ def to_jsonable(x):
         return [to_jsonable(v) for v in x]
     return str(x)
 
-def get_h3_indices(geometry):
-    """Get approximate H3 cells covering geometry."""
+def is_geojsonseq(path):
+    """True for newline-delimited GeoJSON (one feature per line, RFC 8142 record separators allowed)."""
+    return path.lower().endswith(GEOJSONSEQ_EXTENSIONS)
+
+def get_ijson_backend(name='auto'):
+    """The requested ijson backend, or the fastest installed one for 'auto'."""
+    for candidate in (IJSON_BACKENDS if name == 'auto' else [name]):
+        try:
+            return ijson.get_backend(candidate)
+        except ImportError:
+            continue
+    raise ImportError(f"ijson backend {name!r} is not available")
+
+def get_line_parser(name='auto'):
+    """loads() for one GeoJSONSeq line: orjson, then simdjson, then the json module."""
+    if name in ('auto', 'orjson') and orjson is not None:
+        return orjson.loads
+    if name in ('auto', 'simdjson') and simdjson is not None:
+        return simdjson.loads
+    if name in ('auto', 'json'):
+        return json.loads
+    raise ImportError(f"JSON backend {name!r} is not available")
+
+def iter_geojson_features(path, backend=None):
+    """Yield the features of a GeoJSON file as dicts with float coordinates.
+
+    FeatureCollections are streamed with ijson (the C yajl2 backend when it
+    is installed) with use_float, so no Decimal values are produced.
+    GeoJSONSeq files are parsed line by line with orjson, simdjson or json.
+    """
+    backend = backend or JSON_BACKEND
+    if is_geojsonseq(path):
+        loads = get_line_parser('auto' if backend in IJSON_BACKENDS else backend)
+        with open(path, 'rb') as f:
+            for line in f:
+                line = line.strip().lstrip(b'\x1e')
+                if line:
+                    yield loads(line)
+    else:
+        items = get_ijson_backend('auto' if backend in LINE_BACKENDS else backend).items
+        with open(path, 'rb') as f:
+            yield from items(f, 'features.item', use_float=True)
+
+def get_h3_indices(geometry, mode=None, resolution=None):
+    """Get H3 cells covering geometry using the configured coverage mode."""
+    mode = mode or H3_COVERAGE_MODE
+    resolution = resolution if resolution is not None else H3_RESOLUTION
+    if mode == 'sample':
+        return get_h3_sample_indices(geometry, resolution)
+    return get_h3_polyfill_indices(geometry, resolution)
+
+def get_h3_sample_indices(geometry, resolution=None):
+    """Get approximate H3 cells covering geometry (10x10 point grid plus exterior vertices)."""
+    resolution = resolution if resolution is not None else H3_RESOLUTION
     minx, miny, maxx, maxy = geometry.bounds
     indices = set()
     lat_step = (maxy - miny) / 10 if maxy > miny else 1
@@ -381,155 +537,1456 @@ def get_h3_indices(geometry):
         polygons = list(geometry.geoms) if geometry.geom_type == 'MultiPolygon' else [geometry]
         for polygon in polygons:
             for lon, lat in polygon.exterior.coords:
-                indices.add(h3.latlng_to_cell(lat, lon, H3_RESOLUTION))
+                indices.add(h3.latlng_to_cell(lat, lon, resolution))
             for lat in np.arange(miny, maxy, lat_step):
                 for lon in np.arange(minx, maxx, lng_step):
                     if polygon.contains(Point(lon, lat)):
-                        indices.add(h3.latlng_to_cell(lat, lon, H3_RESOLUTION))
+                        indices.add(h3.latlng_to_cell(lat, lon, resolution))
     except Exception as e:
         print(f"[H3] Error for {geometry.geom_type}: {e}")
     return indices
 
-def get_target_countries_from_geojson(geojson_file):
-    print("Extracting countries from GeoJSON...")
-    countries = set()
-    with open(geojson_file, 'rb') as f:
-        for feature in ijson.items(f, 'features.item'):
-            country = feature.get('properties', {}).get('country')
-            if country:
-                countries.add(country)
-    unique_countries = list(countries)
-    iso3_codes = [COUNTRY_TO_ISO3[c] for c in unique_countries if c in COUNTRY_TO_ISO3]
+def get_h3_polyfill_indices(geometry, resolution=None):
+    """Get H3 cells covering geometry: native polyfill plus a ring around the boundary.
+
+    Polyfill only returns cells whose centre lies inside the polygon, so every
+    cell the boundary passes through is added with its neighbours. The boundary
+    is densified to half an edge length and snapped to an eighth of one, which
+    keeps every boundary point within one cell of a sampled vertex and so
+    guarantees that all intersecting cells are returned.
+    """
+    resolution = resolution if resolution is not None else H3_RESOLUTION
+    indices = set()
+    if geometry.is_empty:
+        return indices
+    try:
+        if geometry.geom_type in ('Polygon', 'MultiPolygon'):
+            indices.update(h3.geo_to_cells(geometry, resolution))
+        edge_deg = h3.average_hexagon_edge_length(resolution, unit='km') / 111.32
+        coords = shapely.get_coordinates(shapely.segmentize(geometry, edge_deg / 2))
+        quantum = edge_deg / 8
+        coords = np.unique(np.round(coords / quantum), axis=0) * quantum
+        boundary_cells = {h3.latlng_to_cell(lat, lon, resolution) for lon, lat in coords}
+        for cell in boundary_cells:
+            indices.update(h3.grid_disk(cell, 1))
+    except Exception as e:
+        print(f"[H3] Error for {geometry.geom_type}: {e}")
+    return indices
+
+def get_pa_cells(geometry):
+    """H3 cells posted for a protected area, as {cell: is_interior}.
+
+    With H3_CLASSIFY_INTERIOR, cells whose hexagon lies entirely inside the
+    PA are tagged interior. In multires mode interior and boundary cells are
+    compacted separately, so a compacted interior cell only ever stands for
+    fine cells that are themselves interior.
+    """
+    cells = get_h3_indices(geometry)
+    interior = classify_interior_cells(geometry, cells) if H3_CLASSIFY_INTERIOR else set()
+    boundary = cells - interior
+    if H3_INDEX_MODE == 'multires':
+        interior = set(h3.compact_cells(list(interior)))
+        boundary = set(h3.compact_cells(list(boundary)))
+    return {**{cell: False for cell in boundary}, **{cell: True for cell in interior}}
+
+def classify_interior_cells(geometry, cells):
+    """Subset of cells whose hexagon (plus a small margin) lies inside geometry."""
+    cells = list(cells)
+    if not cells or geometry.geom_type not in ('Polygon', 'MultiPolygon'):
+        return set()
+    centres = np.array([h3.cell_to_latlng(cell) for cell in cells])
+    # a cell whose centre is outside cannot be interior, so skip building its hexagon
+    cells = [cell for cell, inside in zip(cells, shapely.contains_xy(geometry, centres[:, 1], centres[:, 0]))
+             if inside]
+    if not cells:
+        return set()
+    hexagons = shapely.buffer(
+        np.array([Polygon([(lng, lat) for lat, lng in h3.cell_to_boundary(cell)]) for cell in cells]),
+        INTERIOR_MARGIN_DEG)
+    shapely.prepare(geometry)
+    try:
+        inside = shapely.contains(geometry, hexagons)
+    finally:
+        shapely.destroy_prepared(geometry)
+    return {cell for cell, is_inside in zip(cells, inside) if is_inside}
+
+def get_point_cell(geom):
+    """H3 cell of a point guaranteed to lie inside geom."""
+    point = geom.representative_point()
+    return h3.latlng_to_cell(point.y, point.x, H3_RESOLUTION)
+
+def get_cell_resolutions(cells):
+    """Resolution of each uint64 H3 cell (bits 52-55 of the index)."""
+    return ((np.asarray(cells, dtype=np.uint64) >> np.uint64(52)) & np.uint64(0xF)).astype(np.int64)
+
+def get_cell_parents(cells, resolution):
+    """Vectorized cell_to_parent for uint64 H3 cells at resolution or finer."""
+    digits = np.uint64(sum(7 << ((15 - d) * 3) for d in range(resolution + 1, 16)))
+    cells = np.asarray(cells, dtype=np.uint64) & ~(np.uint64(0xF) << np.uint64(52))
+    return cells | (np.uint64(resolution) << np.uint64(52)) | digits
+
+def normalise_country_name(name):
+    """Casefolded, accent-free name with punctuation as single spaces: "Côte d'Ivoire" -> 'cote d ivoire'."""
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(c for c in name if not unicodedata.combining(c)).casefold().replace('&', ' and ')
+    words = ''.join(c if c.isalnum() else ' ' for c in name).split()
+    return ' '.join(words[1:] if words[:1] == ['the'] else words)
+
+@functools.lru_cache(maxsize=1)
+def get_normalised_country_index():
+    """{normalised name or ISO3 code: ISO3} over COUNTRY_TO_ISO3 and COUNTRY_ALIASES, built once."""
+    index = {normalise_country_name(code): code for code in COUNTRY_TO_ISO3.values()}
+    for name, code in {**COUNTRY_TO_ISO3, **COUNTRY_ALIASES}.items():
+        index[normalise_country_name(name)] = code
+    return index
+
+@functools.lru_cache(maxsize=None)
+def resolve_country(name):
+    """(ISO3, how) for a country name, or (None, None) when it cannot be resolved.
+
+    how is 'exact', 'normalised' or 'fuzzy'. Tries COUNTRY_TO_ISO3 as is,
+    then the normalised name against every known name and alias, then the
+    closest normalised name by difflib. Memoised, so each distinct name is
+    only resolved once however many features carry it.
+    """
+    if name in COUNTRY_TO_ISO3:
+        return COUNTRY_TO_ISO3[name], 'exact'
+    index = get_normalised_country_index()
+    key = normalise_country_name(name)
+    if key in index:
+        return index[key], 'normalised'
+    matches = difflib.get_close_matches(key, index.keys(), n=1, cutoff=COUNTRY_FUZZY_CUTOFF)
+    if matches:
+        return index[matches[0]], 'fuzzy'
+    return None, None
+
+def get_target_countries(countries):
+    """ISO3 codes for a collection of project country names.
+
+    Names matched only by similarity are listed so they can be checked, and
+    unresolved names are listed so they can be added to COUNTRY_ALIASES.
+    """
+    unique_countries = sorted({c for c in countries if c}, key=str)
+    resolved = {c: resolve_country(c) for c in unique_countries}
+    iso3_codes = sorted({code for code, _ in resolved.values() if code})
     print(f"Found countries: {unique_countries}")
     print(f"ISO3 codes: {iso3_codes}")
+    fuzzy = {c: code for c, (code, how) in resolved.items() if how == 'fuzzy'}
+    if fuzzy:
+        print(f"Country names matched by similarity (check these): {fuzzy}")
+    unresolved = [c for c, (code, _) in resolved.items() if code is None]
+    if unresolved:
+        print(f"Unresolved country names, their protected areas are not loaded: {unresolved}")
     return iso3_codes
 
-def load_protected_areas(geojson_file, target_countries=None):
+def hash_file(path, chunk_size=8 * 1024 * 1024):
+    """SHA-256 of a file, read in chunks so multi-GB files stay out of memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_wdpa_hash(geojson_file):
+    """SHA-256 of the WDPA source; shard directories record it in their index."""
+    if is_pa_shard_dir(geojson_file):
+        return load_pa_shard_index(geojson_file)['source_sha256']
+    stat = os.stat(geojson_file)
+    return _hash_file_cached(os.path.abspath(geojson_file), stat.st_size, stat.st_mtime)
+
+@functools.lru_cache(maxsize=8)
+def _hash_file_cached(path, size, mtime):
+    return hash_file(path)
+
+def get_pa_cache_path(cache_dir, wdpa_hash, target_countries=None, footprint=None):
+    """Cache directory for one WDPA file (by content hash), country filter and project footprint."""
+    countries_key = ','.join(sorted(set(target_countries))) if target_countries else 'ALL'
+    footprint_key = footprint.digest() if footprint is not None else 'ALL'
+    variant = hashlib.sha256(
+        f"{countries_key}|{footprint_key}|res{H3_RESOLUTION}|{H3_COVERAGE_MODE}|{H3_INDEX_MODE}|"
+        f"interior{int(H3_CLASSIFY_INTERIOR)}|v{PA_CACHE_VERSION}".encode()
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, wdpa_hash[:32], variant)
+
+def get_geojson_bbox(geom_dict):
+    """[minx, miny, maxx, maxy] of a GeoJSON geometry from its raw coordinates, or None."""
+    def walk(coords):
+        if isinstance(coords[0], (int, float)):
+            return np.array([coords[:2]], dtype=float)
+        if isinstance(coords[0][0], (int, float)):
+            return np.asarray([c[:2] for c in coords], dtype=float)
+        return np.concatenate([walk(c) for c in coords if c])
+    try:
+        if geom_dict['type'] == 'GeometryCollection':
+            xy = np.concatenate([walk(g['coordinates']) for g in geom_dict['geometries']])
+        else:
+            xy = walk(geom_dict['coordinates'])
+        return xy.min(axis=0).tolist() + xy.max(axis=0).tolist()
+    except Exception:
+        return None
+
+class ProjectFootprint:
+    """Bounding boxes of all project geometries, for dropping far-away WDPA features.
+
+    The boxes go into an STRtree; a feature whose bbox meets none of them
+    cannot overlap any project.
+    """
+
+    def __init__(self, bounds, margin=BBOX_PREFILTER_MARGIN_DEG):
+        self.bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        self.tree = STRtree(shapely.box(self.bounds[:, 0] - margin, self.bounds[:, 1] - margin,
+                                        self.bounds[:, 2] + margin, self.bounds[:, 3] + margin))
+
+    def intersects(self, bbox):
+        """False only when bbox is known to be disjoint from every project box.
+
+        bbox is a GeoJSON bbox member: every minimum, then every maximum, so
+        a 3D one is [minx, miny, minz, maxx, maxy, maxz]. Any other shape
+        is treated as unknown.
+        """
+        if bbox is None or len(bbox) < 4 or len(bbox) % 2:
+            return True
+        dims = len(bbox) // 2
+        return len(self.tree.query(shapely.box(bbox[0], bbox[1], bbox[dims], bbox[dims + 1]))) > 0
+
+    def extent(self):
+        """(minx, miny, maxx, maxy) over all project boxes."""
+        return tuple(self.bounds[:, :2].min(axis=0).tolist() + self.bounds[:, 2:].max(axis=0).tolist())
+
+    def digest(self):
+        return hashlib.sha256(np.ascontiguousarray(self.bounds).tobytes()).hexdigest()[:16]
+
+def split_iso3(value):
+    """ISO3 codes of a WDPA feature; transboundary areas list several, e.g. 'FRA;GUF'."""
+    return [code.strip() for code in str(value).split(';') if code.strip()] if value else []
+
+def is_pa_shard_dir(path):
+    """True for a directory of WDPA shards written by partition_wdpa.py."""
+    return os.path.isfile(os.path.join(path, PA_SHARD_INDEX))
+
+def load_pa_shard_index(shard_dir):
+    with open(os.path.join(shard_dir, PA_SHARD_INDEX)) as f:
+        return json.load(f)
+
+def select_pa_shards(shard_index, target_countries=None, bbox=None):
+    """Shards holding a target country, else those whose bbox meets bbox, else all of them."""
+    shards = shard_index['shards']
+    if target_countries:
+        targets = set(target_countries)
+        return [s for s in shards if targets.intersection(s['countries'])]
+    if bbox:
+        minx, miny, maxx, maxy = bbox
+        return [s for s in shards if s['bbox'] and s['bbox'][0] <= maxx and s['bbox'][2] >= minx
+                and s['bbox'][1] <= maxy and s['bbox'][3] >= miny]
+    return shards
+
+def iter_pa_shard_features(shard_dir, shards):
+    """Features of the given shards in their original WDPA order.
+
+    Shards are written in source order with a wdpa_seq member, so their
+    streams are merged lazily on it and pa_ids match an unsharded load.
+    """
+    streams = [iter_geojson_features(os.path.join(shard_dir, s['file'])) for s in shards]
+    return heapq.merge(*streams, key=lambda feature: feature['wdpa_seq'])
+
+def read_protected_areas(geojson_file, target_countries=None, footprint=None):
+    """Stream WDPA features, returning (areas, area_cells) for the kept features.
+
+    geojson_file is a WDPA GeoJSON file or a shard directory; for the latter
+    only the shards of the target countries are opened. With a
+    ProjectFootprint, features whose bbox misses every project are skipped
+    before shape() and H3 coverage; the feature's bbox member is used when
+    present, else the bbox of its raw coordinates.
+    """
+    if is_pa_shard_dir(geojson_file):
+        shards = select_pa_shards(load_pa_shard_index(geojson_file), target_countries)
+        print(f"Reading {len(shards)} WDPA shards: {', '.join(s['iso3'] or '-' for s in shards)}")
+        features = iter_pa_shard_features(geojson_file, shards)
+    else:
+        features = iter_geojson_features(geojson_file)
+    targets = set(target_countries or ())
+    areas, area_cells = [], []
+    total, kept, outside = 0, 0, 0
+    for feature in features:
+        total += 1
+        props = feature.get('properties', {})
+        if targets and not targets.intersection(split_iso3(props.get('ISO3'))):
+            continue
+        geom_dict = feature.get('geometry')
+        if not geom_dict:
+            continue
+        if footprint is not None and not footprint.intersects(feature.get('bbox') or get_geojson_bbox(geom_dict)):
+            outside += 1
+            continue
+        try:
+            geom = shape(geom_dict)
+        except Exception:
+            continue
+        area = {attr: to_jsonable(props.get(attr)) for attr in PA_ATTRIBUTES}
+        area['geometry'] = geom
+        area['pa_id'] = len(areas)
+        areas.append(area)
+        area_cells.append(get_pa_cells(geom))
+        kept += 1
+        if total % 1000 == 0:
+            print(f"Processed {total} areas, kept {kept}")
+    print(f"Loaded {kept}/{total} protected areas"
+          + (f" ({outside} skipped outside the project extent)" if footprint is not None else ""))
+    return areas, area_cells
+
+class ProtectedAreaStore:
+    """Compact columnar protected-area index, addressed by integer pa_id.
+
+    Attributes are pandas Categoricals, geometries live in one WKB buffer
+    with int64 offsets and are decoded on demand (recently used ones are kept
+    in an LRU), and the H3 postings are CSR arrays: sorted uint64 cells,
+    int64 offsets into int32 pa_ids, plus an optional parallel bool array
+    marking interior postings. Every array may be a read-only memmap.
+    """
+
+    def __init__(self, attributes, wkb_buffer, wkb_offsets, cells, cell_offsets, cell_area_ids,
+                 cell_interior=None, geometry_cache_size=GEOMETRY_CACHE_SIZE):
+        self.attributes = attributes
+        self.wkb_buffer = wkb_buffer
+        self.wkb_offsets = wkb_offsets
+        self.cells = cells
+        self.cell_offsets = cell_offsets
+        self.cell_area_ids = cell_area_ids
+        self.cell_interior = cell_interior
+        self.geometry_cache_size = geometry_cache_size
+        self._geometries = collections.OrderedDict()
+        self.resolutions = np.unique(get_cell_resolutions(cells)).tolist()
+
+    @classmethod
+    def from_areas(cls, areas, area_cells):
+        """Build a store from read_protected_areas() output."""
+        wkbs = shapely.to_wkb(np.array([area['geometry'] for area in areas], dtype=object))
+        wkb_offsets = np.zeros(len(areas) + 1, dtype=np.int64)
+        wkb_offsets[1:] = np.cumsum([len(b) for b in wkbs])
+        attributes = {attr: pd.Categorical([area[attr] for area in areas]) for attr in PA_ATTRIBUTES}
+
+        posting_cells = np.array(
+            [h3.str_to_int(cell) for cells in area_cells for cell in cells], dtype=np.uint64)
+        posting_areas = np.array(
+            [i for i, cells in enumerate(area_cells) for _ in cells], dtype=np.int32)
+        posting_interior = np.array(
+            [interior for cells in area_cells for interior in cells.values()], dtype=bool)
+        order = np.lexsort((posting_areas, posting_cells))
+        posting_cells, posting_areas = posting_cells[order], posting_areas[order]
+        cells, starts = np.unique(posting_cells, return_index=True)
+        cell_offsets = np.append(starts, len(posting_cells)).astype(np.int64)
+        return cls(attributes, np.frombuffer(b''.join(wkbs), dtype=np.uint8), wkb_offsets,
+                   cells, cell_offsets, posting_areas,
+                   posting_interior[order] if H3_CLASSIFY_INTERIOR else None)
+
+    def __len__(self):
+        return len(self.wkb_offsets) - 1
+
+    def get_wkb(self, pa_id):
+        return self.wkb_buffer[self.wkb_offsets[pa_id]:self.wkb_offsets[pa_id + 1]].tobytes()
+
+    def geometry(self, pa_id):
+        geom = self._geometries.get(pa_id)
+        if geom is not None:
+            self._geometries.move_to_end(pa_id)
+            return geom
+        geom = shapely.from_wkb(self.get_wkb(pa_id))
+        self._geometries[pa_id] = geom
+        if len(self._geometries) > self.geometry_cache_size:
+            self._geometries.popitem(last=False)
+        return geom
+
+    def get_attribute(self, attr, pa_id):
+        column = self.attributes[attr]
+        code = column.codes[pa_id]
+        return None if code < 0 else to_jsonable(column.categories[code])
+
+    def area(self, pa_id, geometry=None, with_geometry=True):
+        """One protected area as a dict of attributes, geometry and pa_id."""
+        area = {attr: self.get_attribute(attr, pa_id) for attr in PA_ATTRIBUTES}
+        if geometry is None and with_geometry:
+            geometry = self.geometry(pa_id)
+        area['geometry'] = geometry
+        area['pa_id'] = pa_id
+        return area
+
+    def areas(self):
+        """Every protected area, decoding all geometries in one vectorized call.
+
+        The decoded geometries stay pinned in the geometry cache, so later
+        lookups (and any preparation done on them) reuse the same objects.
+        """
+        wkbs = np.array([self.get_wkb(i) for i in range(len(self))], dtype=object)
+        geometries = shapely.from_wkb(wkbs)
+        self.geometry_cache_size = max(self.geometry_cache_size, len(self))
+        self._geometries = collections.OrderedDict(enumerate(geometries))
+        return [self.area(i, geom) for i, geom in enumerate(geometries)]
+
+    def get_postings(self, cells):
+        """(cell position, pa_id, interior) for every posting under the given H3 cells or their parents.
+
+        With a multi-resolution (compacted) index a project cell can match a
+        coarser PA cell, so each cell's parents at every coarser resolution
+        present in the index are looked up as well. Cell positions index into
+        cells; interior is None when the index has no interior tags.
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(cells) or not len(self.cells):
+            return empty, empty.astype(np.int32), None if self.cell_interior is None else empty.astype(bool)
+        keys = np.fromiter((h3.str_to_int(cell) for cell in cells), dtype=np.uint64, count=len(cells))
+        coarser = [r for r in self.resolutions if r < get_cell_resolutions(keys).min()]
+        keys = np.column_stack([keys] + [get_cell_parents(keys, r) for r in coarser])
+        origin = np.repeat(np.arange(len(cells)), keys.shape[1])
+        keys = keys.ravel()
+        pos = np.minimum(np.searchsorted(self.cells, keys), len(self.cells) - 1)
+        found = self.cells[pos] == keys
+        pos, origin = pos[found], origin[found]
+        starts = np.asarray(self.cell_offsets[pos])
+        lengths = np.asarray(self.cell_offsets[pos + 1]) - starts
+        ends = np.cumsum(lengths)
+        postings = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+        interior = None if self.cell_interior is None else np.asarray(self.cell_interior[postings])
+        return np.repeat(origin, lengths), np.asarray(self.cell_area_ids[postings]), interior
+
+    def candidate_ids(self, cells):
+        """Sorted unique pa_ids posted under any of the given H3 cells or their parents."""
+        return np.unique(self.get_postings(list(cells))[1])
+
+    def interior_ids(self, cells, require_all=False):
+        """pa_ids for which any (or, with require_all, every) given cell is an interior cell."""
+        cells = list(cells)
+        origin, pa_ids, interior = self.get_postings(cells)
+        if interior is None:
+            return np.zeros(0, dtype=np.int32)
+        if not require_all:
+            return np.unique(pa_ids[interior])
+        pairs = np.unique(np.column_stack([pa_ids[interior], origin[interior]]), axis=0)
+        ids, counts = np.unique(pairs[:, 0], return_counts=True)
+        return ids[counts == len(cells)]
+
+def write_pa_cache(cache_path, store, wdpa_hash, target_countries=None, footprint=None):
+    """Write the protected-area index artifact.
+
+    Layout: WKB geometries concatenated in geometries.wkb with int64 offsets,
+    attribute columns as JSON, and H3 postings in CSR form (sorted uint64
+    cells, int64 offsets, int32 area ids). manifest.json is written last and
+    marks the artifact as complete.
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    with open(os.path.join(cache_path, 'geometries.wkb'), 'wb') as f:
+        f.write(store.wkb_buffer.tobytes())
+    np.save(os.path.join(cache_path, 'geometry_offsets.npy'), store.wkb_offsets)
+
+    columns = {attr: [store.get_attribute(attr, i) for i in range(len(store))] for attr in PA_ATTRIBUTES}
+    with open(os.path.join(cache_path, 'attributes.json'), 'w') as f:
+        json.dump(columns, f)
+
+    np.save(os.path.join(cache_path, 'h3_cells.npy'), store.cells)
+    np.save(os.path.join(cache_path, 'h3_offsets.npy'), store.cell_offsets)
+    np.save(os.path.join(cache_path, 'h3_area_ids.npy'), store.cell_area_ids)
+    if store.cell_interior is not None:
+        np.save(os.path.join(cache_path, 'h3_interior.npy'), store.cell_interior)
+
+    manifest = {
+        'version': PA_CACHE_VERSION,
+        'wdpa_sha256': wdpa_hash,
+        'target_countries': sorted(set(target_countries)) if target_countries else None,
+        'project_footprint': footprint.digest() if footprint is not None else None,
+        'h3_resolution': H3_RESOLUTION,
+        'h3_coverage': H3_COVERAGE_MODE,
+        'h3_index': H3_INDEX_MODE,
+        'h3_interior': H3_CLASSIFY_INTERIOR,
+        'areas': len(store),
+        'cells': int(len(store.cells)),
+        'postings': int(len(store.cell_area_ids)),
+    }
+    with open(os.path.join(cache_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote protected-area index cache: {cache_path}")
+
+def load_pa_cache(cache_path):
+    """Memory-map a protected-area index artifact as a ProtectedAreaStore."""
+    print(f"Loading protected-area index cache: {cache_path}")
+    wkb_offsets = np.load(os.path.join(cache_path, 'geometry_offsets.npy'), mmap_mode='r')
+    wkb_buffer = np.memmap(os.path.join(cache_path, 'geometries.wkb'), dtype=np.uint8, mode='r') \
+        if wkb_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+    with open(os.path.join(cache_path, 'attributes.json')) as f:
+        columns = json.load(f)
+    store = ProtectedAreaStore(
+        {attr: pd.Categorical(columns[attr]) for attr in PA_ATTRIBUTES},
+        wkb_buffer,
+        wkb_offsets,
+        np.load(os.path.join(cache_path, 'h3_cells.npy'), mmap_mode='r'),
+        np.load(os.path.join(cache_path, 'h3_offsets.npy'), mmap_mode='r'),
+        np.load(os.path.join(cache_path, 'h3_area_ids.npy'), mmap_mode='r'),
+        np.load(os.path.join(cache_path, 'h3_interior.npy'), mmap_mode='r')
+        if os.path.exists(os.path.join(cache_path, 'h3_interior.npy')) else None,
+    )
+    print(f"Loaded {len(store)} protected areas from cache")
+    return store
+
+def load_protected_areas(geojson_file, target_countries=None, cache_dir=None, bbox=None, footprint=None):
+    """Load WDPA into a ProtectedAreaStore, via the on-disk cache when cache_dir is set.
+
+    With a shard directory and no target countries, bbox (the project
+    extent) picks the shards to load instead of loading all of them. A
+    ProjectFootprint restricts the load to PAs near the projects, and the
+    cache artifact is then specific to that footprint.
+    """
     print("Loading protected areas...")
-    protected_areas_index = {}
-    total, kept = 0, 0
-    with open(geojson_file, 'rb') as f:
-        for feature in ijson.items(f, 'features.item'):
-            total += 1
-            props = feature.get('properties', {})
-            if target_countries and props.get('ISO3') not in target_countries:
-                continue
-            geom_dict = feature.get('geometry')
-            if not geom_dict:
-                continue
+    if footprint is not None and bbox is None:
+        bbox = footprint.extent()
+    if is_pa_shard_dir(geojson_file):
+        shard_index = load_pa_shard_index(geojson_file)
+        if not target_countries and bbox:
+            target_countries = sorted({code for shard in select_pa_shards(shard_index, bbox=bbox)
+                                       for code in shard['countries']})
+            print(f"Project extent {bbox} touches shards for: {target_countries}")
+    if not cache_dir:
+        return ProtectedAreaStore.from_areas(*read_protected_areas(geojson_file, target_countries, footprint))
+
+    wdpa_hash = get_wdpa_hash(geojson_file)
+    cache_path = get_pa_cache_path(cache_dir, wdpa_hash, target_countries, footprint)
+    if os.path.exists(os.path.join(cache_path, 'manifest.json')):
+        return load_pa_cache(cache_path)
+    store = ProtectedAreaStore.from_areas(*read_protected_areas(geojson_file, target_countries, footprint))
+    write_pa_cache(cache_path, store, wdpa_hash, target_countries, footprint)
+    return store
+
+def build_result_row(project_id, area=None):
+    pa = {column: None for column in RESULT_COLUMNS}
+    pa['id'] = project_id
+    pa['unep_overlap'] = False
+    if area is not None:
+        pa.update({f'PA_{attr}': to_jsonable(area[attr]) for attr in PA_ATTRIBUTES})
+        pa['unep_overlap'] = True
+    return pa
+
+class PreparedAreaCache:
+    """LRU of prepared protected-area geometries, keyed by pa_id.
+
+    Geometries are prepared in place on first use so GEOS keeps their edge
+    index between tests; the least recently used are unprepared once more
+    than max_size are held.
+    """
+
+    def __init__(self, max_size=PREPARED_CACHE_SIZE):
+        self.max_size = max_size
+        self._prepared = collections.OrderedDict()
+
+    def get(self, area):
+        pa_id = area['pa_id']
+        if pa_id in self._prepared:
+            self._prepared.move_to_end(pa_id)
+            return self._prepared[pa_id]
+        shapely.prepare(area['geometry'])
+        self._prepared[pa_id] = area['geometry']
+        if len(self._prepared) > self.max_size:
+            _, evicted = self._prepared.popitem(last=False)
+            shapely.destroy_prepared(evicted)
+        return area['geometry']
+
+def prepare_protected_areas(areas):
+    """Prepare every protected-area geometry up front (eager mode)."""
+    shapely.prepare(np.array([area['geometry'] for area in areas], dtype=object))
+
+def get_h3_candidates(geom, protected_areas_index):
+    """Protected areas sharing an H3 cell with geom, in pa_id order, plus the pa_ids known to contain geom.
+
+    A PA contains geom when every cell covering geom is one of its interior
+    cells; those candidates are returned without decoding their geometry.
+    """
+    cells = get_h3_indices(geom)
+    contained = set(protected_areas_index.interior_ids(cells, require_all=True).tolist())
+    areas = [protected_areas_index.area(pa_id, with_geometry=pa_id not in contained)
+             for pa_id in protected_areas_index.candidate_ids(cells).tolist()]
+    return areas, contained
+
+def find_overlap_h3(geom, protected_areas_index, prepared=None):
+    """First intersecting protected area (lowest pa_id) among the H3 candidates.
+
+    If the index tags interior cells, a candidate whose interior cell holds a
+    point of geom is an overlap without any geometry test.
+    """
+    interior = set()
+    if protected_areas_index.cell_interior is not None:
+        interior = set(protected_areas_index.interior_ids([get_point_cell(geom)]).tolist())
+    for pa_id in protected_areas_index.candidate_ids(get_h3_indices(geom)).tolist():
+        if pa_id in interior:
+            return protected_areas_index.area(pa_id, with_geometry=False)
+        area = protected_areas_index.area(pa_id)
+        pa_geom = prepared.get(area) if prepared is not None else area['geometry']
+        # PA first: GEOS only uses a prepared geometry as the left operand.
+        if pa_geom.intersects(geom):
+            return area
+    return None
+
+def _to_equal_area(coords):
+    """Lon/lat degrees to Lambert cylindrical equal-area metres on the WGS84 ellipsoid."""
+    lon, lat = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    e = WGS84_E
+    sin_lat = np.sin(lat)
+    q = (1 - e ** 2) * (sin_lat / (1 - (e * sin_lat) ** 2)
+                        - np.log((1 - e * sin_lat) / (1 + e * sin_lat)) / (2 * e))
+    return np.column_stack([WGS84_A * lon, WGS84_A * q / 2])
+
+def equal_area_hectares(geom):
+    """Area of a lon/lat geometry (or array of them) in hectares, measured in an equal-area projection."""
+    if isinstance(geom, np.ndarray):
+        return shapely.area(shapely.transform(geom, _to_equal_area)) / 10000
+    if geom.is_empty:
+        return 0.0
+    return shapely.transform(geom, _to_equal_area).area / 10000
+
+def measure_overlaps(geom, candidate_areas, prepared=None, contained=()):
+    """(area, overlap hectares) for every candidate protected area that overlaps geom.
+
+    Candidates in contained (pa_ids already known to contain geom) need no
+    geometry work; the rest are dropped early when their bbox is disjoint,
+    and the intersection is only computed when neither geometry contains the
+    other. Pairs GEOS cannot overlay (invalid WDPA polygons) are measured
+    again on make_valid copies.
+    """
+    minx, miny, maxx, maxy = geom.bounds
+    project_hectares = None
+    overlaps = []
+    for area in candidate_areas:
+        if area['pa_id'] in contained:
+            if project_hectares is None:
+                project_hectares = equal_area_hectares(geom)
+            overlaps.append((area, project_hectares))
+            continue
+        pa_geom = prepared.get(area) if prepared is not None else area['geometry']
+        pa_minx, pa_miny, pa_maxx, pa_maxy = pa_geom.bounds
+        if pa_minx > maxx or pa_maxx < minx or pa_miny > maxy or pa_maxy < miny:
+            continue
+        try:
+            overlap_hectares = get_overlap_hectares(geom, pa_geom)
+        except shapely.errors.GEOSException:
+            # Self-intersecting WDPA polygons break the overlay; measure a repaired copy instead
+            overlap_hectares = get_overlap_hectares(shapely.make_valid(geom), shapely.make_valid(pa_geom))
+        if overlap_hectares is None:
+            continue
+        if overlap_hectares is CONTAINED:
+            if project_hectares is None:
+                project_hectares = equal_area_hectares(geom)
+            overlap_hectares = project_hectares
+        overlaps.append((area, overlap_hectares))
+    return overlaps
+
+def get_overlap_hectares(geom, pa_geom):
+    """Hectares of geom inside pa_geom, None if they do not intersect, CONTAINED if all of geom is inside."""
+    if not pa_geom.intersects(geom):
+        return None
+    if pa_geom.contains(geom):
+        return CONTAINED
+    if geom.contains(pa_geom):
+        return equal_area_hectares(pa_geom)
+    return equal_area_hectares(geom.intersection(pa_geom))
+
+def build_overlap_rows(project_id, geom, overlaps):
+    """Long-format rows, one per (project, PA); a single empty row if nothing overlaps."""
+    project_hectares = equal_area_hectares(geom)
+    if not overlaps:
+        row = build_result_row(project_id)
+        row.update({'project_hectares': project_hectares, 'overlap_hectares': 0.0, 'overlap_percent': 0.0})
+        return [row]
+    rows = []
+    for area, overlap_hectares in overlaps:
+        row = build_result_row(project_id, area)
+        row.update({
+            'project_hectares': project_hectares,
+            'overlap_hectares': overlap_hectares,
+            'overlap_percent': overlap_hectares / project_hectares * 100 if project_hectares else 0.0,
+        })
+        rows.append(row)
+    return rows
+
+def strtree_join(project_geometries, tree):
+    """Bulk spatial join returning (project_idx, pa_idx) arrays of intersecting pairs.
+
+    tree is a shapely STRtree over the protected-area geometries; the whole
+    batch is queried in one vectorized call.
+    """
+    project_idx, pa_idx = tree.query(np.asarray(project_geometries, dtype=object), predicate='intersects')
+    return project_idx, pa_idx
+
+def find_overlaps_strtree(project_geometries, tree, areas):
+    """First intersecting protected area (lowest pa_id) for each project, or None."""
+    project_idx, pa_idx = strtree_join(project_geometries, tree)
+    order = np.lexsort((pa_idx, project_idx))
+    project_idx, pa_idx = project_idx[order], pa_idx[order]
+    first_projects, first = np.unique(project_idx, return_index=True)
+    matches = [None] * len(project_geometries)
+    for i, j in zip(first_projects.tolist(), pa_idx[first].tolist()):
+        matches[i] = areas[j]
+    return matches
+
+def find_candidates_strtree(project_geometries, tree, areas):
+    """Every intersecting protected area for each project, in pa_id order."""
+    project_idx, pa_idx = strtree_join(project_geometries, tree)
+    order = np.lexsort((pa_idx, project_idx))
+    candidates = [[] for _ in project_geometries]
+    for i, j in zip(project_idx[order].tolist(), pa_idx[order].tolist()):
+        candidates[i].append(areas[j])
+    return candidates
+
+def hilbert_index(x, y, order=HILBERT_ORDER):
+    """Distance along a Hilbert curve of integer grid cells (x, y) in [0, 2**order), vectorised."""
+    n = 1 << order
+    x, y = np.asarray(x, dtype=np.int64).copy(), np.asarray(y, dtype=np.int64).copy()
+    d = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx, ry = (x & s) > 0, (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotate the quadrant so the curve stays continuous
+        flip = ~ry & rx
+        x[flip], y[flip] = n - 1 - x[flip], n - 1 - y[flip]
+        swap = ~ry
+        x[swap], y[swap] = y[swap], x[swap]
+        s >>= 1
+    return d
+
+def get_spatial_keys(bounds, mode='hilbert'):
+    """Sort key per project from its bbox centre: Hilbert curve distance or H3 cell.
+
+    Sorting H3 cell ints groups projects by base cell and then by parent
+    cell, so both keep neighbouring projects next to each other.
+    """
+    centre_x = np.nan_to_num((bounds[:, 0] + bounds[:, 2]) / 2)
+    centre_y = np.nan_to_num((bounds[:, 1] + bounds[:, 3]) / 2)
+    if mode == 'h3':
+        return np.array([h3.str_to_int(h3.latlng_to_cell(y, x, H3_RESOLUTION))
+                         for x, y in zip(centre_x.tolist(), centre_y.tolist())], dtype=np.uint64)
+    n = 1 << HILBERT_ORDER
+    grid_x = np.clip(((centre_x + 180) / 360 * n).astype(np.int64), 0, n - 1)
+    grid_y = np.clip(((centre_y + 90) / 180 * n).astype(np.int64), 0, n - 1)
+    return hilbert_index(grid_x, grid_y)
+
+def get_spatial_windows(projects, positions, mode='hilbert', window=None):
+    """Split table rows into windows of consecutive projects, each reordered along the spatial key."""
+    window = window or SPATIAL_SORT_WINDOW
+    keys = get_spatial_keys(projects.get_bounds(), mode)[positions]
+    return [positions[start:start + window][np.argsort(keys[start:start + window], kind='stable')]
+            for start in range(0, len(positions), window)]
+
+def restore_feature_order(results, window_chunks):
+    """Regroup chunk results of spatially ordered windows into feature order, one window at a time.
+
+    window_chunks holds the number of chunks in each window; every window
+    comes back as a single (results, errors) pair sorted by feature idx.
+    """
+    results = iter(results)
+    for chunk_count in window_chunks:
+        window_results, window_errors = [], []
+        for _ in range(chunk_count):
+            chunk_results, chunk_errors = next(results)
+            window_results.extend(chunk_results)
+            window_errors.extend(chunk_errors)
+        window_results.sort(key=lambda result: result[0])
+        window_errors.sort(key=lambda error: error[0])
+        yield window_results, window_errors
+
+def iter_project_chunks(projects_geojson_file, chunk_size=PROJECT_CHUNK_SIZE, start=0):
+    """Yield lists of (feature idx, project id, GeoJSON geometry), skipping the first start features."""
+    chunk = []
+    for idx, feature in enumerate(iter_geojson_features(projects_geojson_file)):
+        if idx < start:
+            continue
+        props = feature.get('properties', {})
+        project_id = props.get('id') or feature.get('id')  # support either location
+        chunk.append((idx, project_id, feature.get('geometry')))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class ProjectTable:
+    """Projects parsed once into columns: feature idx, id, country and WKB geometry.
+
+    Geometries live in one contiguous WKB buffer with int64 offsets, held in
+    memory or spilled to a temporary file and memory-mapped. Features whose
+    geometry could not be parsed are kept in errors instead. properties
+    holds any extra property columns requested at ingest, by name.
+    """
+
+    def __init__(self, path, feature_idx, ids, countries, wkb_buffer, wkb_offsets, errors, spill_file=None,
+                 properties=None):
+        self.path = path
+        self.feature_idx = feature_idx
+        self.ids = ids
+        self.countries = countries
+        self.wkb_buffer = wkb_buffer
+        self.wkb_offsets = wkb_offsets
+        self.errors = errors
+        self._spill_file = spill_file  # deleted when the table is garbage collected
+        self.properties = properties or {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_wkb(self, i):
+        return bytes(self.wkb_buffer[self.wkb_offsets[i]:self.wkb_offsets[i + 1]])
+
+    def iter_chunks(self, chunk_size=PROJECT_CHUNK_SIZE, start=0, positions=None):
+        """Yield lists of (feature idx, project id, WKB) for features at or after start.
+
+        positions restricts the chunks to those table rows (ascending).
+        """
+        positions = range(len(self)) if positions is None else positions
+        first = int(np.searchsorted(self.feature_idx[positions], start)) if len(positions) else 0
+        for chunk_start in range(first, len(positions), chunk_size):
+            rows = positions[chunk_start:chunk_start + chunk_size]
+            yield [(int(self.feature_idx[i]), self.ids[i], self.get_wkb(i)) for i in rows]
+
+    def get_source_hashes(self):
+        """Hex digest per project of its WKB geometry and country, the inputs that decide its result rows."""
+        return [hashlib.sha256(self.get_wkb(i) + str(self.countries[i]).encode()).hexdigest()[:32]
+                for i in range(len(self))]
+
+    def get_bounds(self, chunk_size=PROJECT_CHUNK_SIZE):
+        """(n, 4) array of minx, miny, maxx, maxy per project, decoded chunk by chunk."""
+        bounds = [shapely.bounds(shapely.from_wkb([wkb for _, _, wkb in chunk]))
+                  for chunk in self.iter_chunks(chunk_size)]
+        return np.concatenate(bounds) if bounds else np.zeros((0, 4))
+
+    def bounds(self):
+        """(minx, miny, maxx, maxy) of all project geometries, or None for an empty table."""
+        bounds = self.get_bounds()
+        if not len(bounds):
+            return None
+        return tuple(bounds[:, :2].min(axis=0).tolist() + bounds[:, 2:].max(axis=0).tolist())
+
+def ingest_projects(projects_geojson_file, spill_dir=None, properties=()):
+    """Parse the projects file once into a ProjectTable for the country filter and overlap check.
+
+    properties names extra feature properties to keep as columns.
+    """
+    print("Ingesting projects...")
+    feature_idx, ids, countries, offsets, errors = [], [], [], [0], []
+    extra = {name: [] for name in properties}
+    spill_file = tempfile.NamedTemporaryFile(dir=spill_dir, suffix='.wkb') if spill_dir else None
+    buffer = spill_file if spill_file else bytearray()
+    for idx, feature in enumerate(iter_geojson_features(projects_geojson_file)):
+        props = feature.get('properties', {})
+        try:
+            wkb = shape(feature['geometry']).wkb
+        except Exception as e:
+            errors.append((idx, str(e)))
+            continue
+        if spill_file:
+            spill_file.write(wkb)
+        else:
+            buffer.extend(wkb)
+        feature_idx.append(idx)
+        ids.append(props.get('id') or feature.get('id'))  # support either location
+        countries.append(props.get('country'))
+        for name, column in extra.items():
+            column.append(props.get(name))
+        offsets.append(offsets[-1] + len(wkb))
+        if len(ids) % 10000 == 0:
+            print(f"Ingested {len(ids)} projects...")
+    if spill_file:
+        spill_file.flush()
+        buffer = np.memmap(spill_file.name, dtype=np.uint8, mode='r') if offsets[-1] else b''
+    print(f"Ingested {len(ids)} projects ({offsets[-1] / 1e6:.1f} MB of WKB, {len(errors)} unreadable)")
+    return ProjectTable(projects_geojson_file, np.array(feature_idx, dtype=np.int64), ids, countries,
+                        buffer, np.array(offsets, dtype=np.int64), errors, spill_file, extra)
+
+def process_project_chunk(chunk, protected_areas_index, engine='h3', tree=None, areas=None, prepared=None,
+                          full_overlap=False):
+    """Run the overlap check on one chunk of (feature idx, project id, geometry).
+
+    geometry is either a GeoJSON mapping or WKB bytes from a ProjectTable.
+
+    Returns (results, errors): results holds (feature idx, rows) per project,
+    in input order, with a single row or one row per overlapping PA with
+    full_overlap; errors holds (feature idx, message) pairs.
+    """
+    results, errors = [], []
+    projects = []
+    for idx, project_id, geometry in chunk:
+        try:
+            geom = shapely.from_wkb(geometry) if isinstance(geometry, bytes) else shape(geometry)
+            projects.append((idx, project_id, geom))
+        except Exception as e:
+            errors.append((idx, str(e)))
+
+    find_bulk = find_candidates_strtree if full_overlap else find_overlaps_strtree
+    matches = None
+    if engine == 'strtree':
+        try:
+            matches = find_bulk([geom for _, _, geom in projects], tree, areas)
+        except Exception:
+            pass  # fall back to one query per project so only the bad geometries error
+
+    for i, (idx, project_id, geom) in enumerate(projects):
+        contained = ()
+        try:
+            if matches is not None:
+                match = matches[i]
+            elif engine == 'strtree':
+                match = find_bulk([geom], tree, areas)[0]
+            elif full_overlap:
+                match, contained = get_h3_candidates(geom, protected_areas_index)
+            else:
+                match = find_overlap_h3(geom, protected_areas_index, prepared)
+
+            if full_overlap:
+                results.append((idx, build_overlap_rows(project_id, geom, measure_overlaps(geom, match, prepared, contained))))
+            else:
+                results.append((idx, [build_result_row(project_id, match)]))
+        except Exception as e:
+            errors.append((idx, str(e)))
+    return results, errors
+
+def get_frame_types(columns):
+    """Pandas dtype of each result column when results are kept in memory."""
+    return {c: FRAME_TYPES[PARQUET_TYPES[c]] if c in PARQUET_TYPES else 'string' for c in columns}
+
+class OverlapResultWriter:
+    """Stream result rows to CSV or Parquet, flushing every batch_size rows.
+
+    Only the current batch is held in memory. Each flush appends to the CSV
+    (or writes one Parquet row group), so peak memory does not grow with the
+    number of projects and a crashed run keeps every flushed batch.
+
+    With path None the rows are kept instead: after close(), frame holds
+    them as a DataFrame indexed by feature idx, typed by get_frame_types().
+    """
+
+    def __init__(self, path, columns, output_format=None, batch_size=RESULT_BATCH_SIZE, append_at=None):
+        self.path = path
+        self.columns = columns
+        if path is None:
+            output_format = 'frame'
+        self.output_format = output_format or ('parquet' if path.endswith('.parquet') else 'csv')
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self.frame = None
+        self._batch = []
+        self._batch_idx = []
+        if self.output_format == 'frame':
+            self._frames = []
+        elif self.output_format == 'parquet':
+            if pyarrow is None:
+                raise ImportError("Parquet output requires pyarrow")
+            self._schema = pyarrow.schema([(c, PARQUET_TYPES.get(c, 'string')) for c in columns])
+            self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        elif append_at is not None:
+            # Resuming: drop anything written after the last checkpoint, then append.
+            os.truncate(path, append_at)
+            self._file = open(path, 'a', newline='')
+        else:
+            self._file = open(path, 'w', newline='')
+            pd.DataFrame(columns=columns).to_csv(self._file, index=False)
+
+    def write(self, rows, idx=None):
+        self._batch.extend(rows)
+        if self.output_format == 'frame':
+            self._batch_idx.extend([idx] * len(rows))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        if self.output_format == 'frame':
+            self._frames.append(pd.DataFrame(self._batch, columns=self.columns, dtype=object,
+                                             index=pd.Index(self._batch_idx, dtype=np.int64, name='feature')))
+            self._batch_idx = []
+        elif self.output_format == 'parquet':
+            string_columns = [c for c in self.columns if c not in PARQUET_TYPES]
+            for row in self._batch:
+                for c in string_columns:
+                    if row[c] is not None:
+                        row[c] = str(row[c])
+            self._writer.write_table(pyarrow.Table.from_pylist(self._batch, schema=self._schema))
+        else:
+            # object dtype keeps values as-is, so formatting does not depend on the batch
+            pd.DataFrame(self._batch, columns=self.columns, dtype=object).to_csv(
+                self._file, header=False, index=False)
+            self._file.flush()
+        self.rows_written += len(self._batch)
+        self._batch = []
+
+    def tell(self):
+        """Bytes of CSV written so far, including the current batch."""
+        self.flush()
+        return self._file.tell()
+
+    def close(self):
+        self.flush()
+        if self.output_format == 'frame':
+            frames = self._frames or [pd.DataFrame(columns=self.columns, index=pd.Index([], dtype=np.int64,
+                                                                                        name='feature'))]
+            self.frame = pd.concat(frames).astype(get_frame_types(self.columns))
+            self._frames = []
+        elif self.output_format == 'parquet':
+            self._writer.close()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _process_project_chunk_in_worker(chunk):
+    return process_project_chunk(chunk, **_worker_context)
+
+def imap_ordered(pool, func, iterable, max_pending):
+    """Like Pool.imap, but keeps at most max_pending tasks in flight."""
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def get_checkpoint_path(output_csv):
+    return output_csv + '.checkpoint.json'
+
+def get_projects_file_stamp(projects_geojson_file):
+    stat = os.stat(projects_geojson_file)
+    return {'path': os.path.abspath(projects_geojson_file), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """Write the checkpoint atomically so a crash mid-write leaves the previous one."""
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+def load_checkpoint(checkpoint_path, projects_geojson_file, columns, state=None):
+    """Read a checkpoint, refusing it if the projects file, output layout or run state changed.
+
+    state is the get_result_store_state() of this run (WDPA hash, country
+    filter, H3 settings); rows written under another state must not be
+    appended to.
+    """
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint['projects_file'] != get_projects_file_stamp(projects_geojson_file):
+        raise ValueError(f"{projects_geojson_file} changed since the checkpoint was written; rerun without --resume")
+    if checkpoint['columns'] != columns:
+        raise ValueError("Output columns differ from the checkpointed run (check --full-overlap); rerun without --resume")
+    state, previous = state or {}, checkpoint.get('state') or {}
+    changed = sorted(k for k in set(state) | set(previous) if state.get(k) != previous.get(k))
+    if changed:
+        raise ValueError(f"{', '.join(changed)} changed since the checkpoint was written; rerun without --resume")
+    return checkpoint
+
+class OverlapResultStore:
+    """Result rows of earlier runs, keyed by (source id, source hash), for incremental runs.
+
+    The store is a directory holding results.jsonl (a state header line,
+    then one line per source: id, hash and its result rows) and
+    manifest.json. The manifest records the WDPA hash and every setting
+    that changes result rows; if any of them differ the stored rows are
+    discarded and every source is rechecked.
+
+    Only the byte offset of each stored line is kept in memory; carried
+    rows are read back as they are written out. This run's rows are
+    streamed to results.jsonl.tmp as they arrive and replace results.jsonl
+    in save(). A crashed run's file is kept as a partial store, so its
+    results are reused by the next run with the same state.
+    """
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+        self.files = []  # store files the offsets in previous point into
+        self.previous = {}
+        self.keys = {}
+        self.carried = None
+        self.pending = None
+        self.recorded = 0
+        self._tmp_path = os.path.join(path, 'results.jsonl.tmp')
+        self._tmp_file = None
+        manifest_path = os.path.join(path, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            print(f"No results store at {path}")
+        else:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            changed = sorted(k for k in set(state) | set(manifest['state'])
+                             if state.get(k) != manifest['state'].get(k))
+            if changed:
+                print(f"Results store invalidated ({', '.join(changed)} changed)")
+            else:
+                self._index_file(os.path.join(path, 'results.jsonl'))
+        if os.path.exists(self._tmp_path):
+            numbers = self._get_partial_numbers()
+            os.replace(self._tmp_path, self._get_partial_path(numbers[-1] + 1 if numbers else 0))
+        for n in self._get_partial_numbers():
+            if not self._index_file(self._get_partial_path(n)):
+                os.remove(self._get_partial_path(n))
+        if self.previous:
+            print(f"Loaded {len(self.previous)} stored results from {path}")
+        else:
+            print("Checking every source")
+
+    def _get_partial_path(self, n):
+        return os.path.join(self.path, f'results.partial-{n}.jsonl')
+
+    def _get_partial_numbers(self):
+        """Numbers of the store files left by crashed runs, oldest first."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(int(name[len('results.partial-'):-len('.jsonl')]) for name in os.listdir(self.path)
+                      if name.startswith('results.partial-') and name.endswith('.jsonl'))
+
+    def _index_file(self, file_path):
+        """Add the offset of every complete line of a store file written with this state; False if stale."""
+        with open(file_path, 'rb') as f:
             try:
-                geom = shape(geom_dict)
-            except Exception:
-                continue
-            area = {
-                'WDPAID': to_jsonable(props.get('WDPAID')),
-                'NAME': to_jsonable(props.get('NAME')),
-                'DESIG_ENG': to_jsonable(props.get('DESIG_ENG')),
-                'IUCN_CAT': to_jsonable(props.get('IUCN_CAT')),
-                'MARINE': to_jsonable(props.get('MARINE')),
-                'STATUS': to_jsonable(props.get('STATUS')),
-                'STATUS_YR': to_jsonable(props.get('STATUS_YR')),
-                'ISO3': to_jsonable(props.get('ISO3')),
-                'geometry': geom,
-            }
-            for idx in get_h3_indices(geom):
-                protected_areas_index.setdefault(idx, []).append(area)
-            kept += 1
-            if total % 1000 == 0:
-                print(f"Processed {total} areas, kept {kept}")
-    print(f"Loaded {kept}/{total} protected areas")
-    return protected_areas_index
-
-def process_projects_to_csv(projects_geojson_file, protected_areas_index, output_csv):
+                if json.loads(f.readline()).get('state') != self.state:
+                    return False
+            except ValueError:
+                return False
+            file_no = len(self.files)
+            self.files.append(file_path)
+            offset = f.tell()
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # cut off by a crash
+                self.previous[(entry['id'], entry['hash'])] = (file_no, offset)
+                offset += len(line)
+        return True
+
+    def diff(self, projects):
+        """Split a ProjectTable into carried-forward (feature idx, stored line) and table rows to check."""
+        self.carried, self.pending = [], []
+        for i, source_hash in enumerate(projects.get_source_hashes()):
+            idx = int(projects.feature_idx[i])
+            key = (projects.ids[i], source_hash)
+            self.keys[idx] = key
+            if key in self.previous:
+                self.carried.append((idx, self.previous[key]))
+            else:
+                self.pending.append(i)
+        self.pending = np.array(self.pending, dtype=np.int64)
+        print(f"Carrying forward {len(self.carried)} unchanged sources, "
+              f"checking {len(self.pending)} new or changed")
+        return self.carried, self.pending
+
+    def iter_carried(self):
+        """Yield (feature idx, rows) of the carried-forward sources, read from the store files."""
+        files = [open(file_path, 'rb') for file_path in self.files]
+        try:
+            for idx, (file_no, offset) in self.carried:
+                files[file_no].seek(offset)
+                yield idx, json.loads(files[file_no].readline())['rows']
+        finally:
+            for f in files:
+                f.close()
+
+    def _open_tmp_file(self):
+        if self._tmp_file is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._tmp_file = open(self._tmp_path, 'w')
+            self._tmp_file.write(json.dumps({'state': self.state}) + '\n')
+        return self._tmp_file
+
+    def record(self, idx, rows):
+        project_id, source_hash = self.keys[idx]
+        self._open_tmp_file().write(json.dumps({'id': project_id, 'hash': source_hash, 'rows': rows},
+                                               default=to_jsonable) + '\n')
+        self.recorded += 1
+
+    def save(self):
+        """Replace the store with this run's results; sources no longer exported are dropped."""
+        self._open_tmp_file().close()
+        self._tmp_file = None
+        os.replace(self._tmp_path, os.path.join(self.path, 'results.jsonl'))
+        save_checkpoint(os.path.join(self.path, 'manifest.json'),
+                        {'version': RESULT_STORE_VERSION, 'state': self.state, 'sources': self.recorded})
+        for n in self._get_partial_numbers():
+            os.remove(self._get_partial_path(n))
+        print(f"Saved {self.recorded} results to {self.path}")
+
+def get_result_store_state(wdpa_hash, target_countries, full_overlap):
+    """Everything besides the source itself that decides its result rows."""
+    return {
+        'version': RESULT_STORE_VERSION,
+        'wdpa_sha256': wdpa_hash,
+        'target_countries': sorted(set(target_countries)) if target_countries else None,
+        'columns': FULL_OVERLAP_COLUMNS if full_overlap else RESULT_COLUMNS,
+        'h3_resolution': H3_RESOLUTION,
+        'h3_coverage': H3_COVERAGE_MODE,
+    }
+
+def merge_carried_results(results, carried):
+    """Interleave carried-forward (feature idx, rows) into a chunk results stream in feature order."""
+    carried = iter(carried)
+    pending = next(carried, None)
+    for chunk_results, chunk_errors in results:
+        merged = []
+        for idx, rows in chunk_results:
+            while pending is not None and pending[0] < idx:
+                merged.append(pending)
+                pending = next(carried, None)
+            merged.append((idx, rows))
+        yield merged, chunk_errors
+    while pending is not None:  # carried sources after the last checked one, a batch at a time
+        rest = [pending] + list(itertools.islice(carried, RESULT_BATCH_SIZE - 1))
+        pending = next(carried, None)
+        yield rest, []
+
+def process_projects_to_csv(projects, protected_areas_index, output_csv, engine='h3',
+                            workers=1, chunk_size=None, prepare='off', prepared_cache_size=PREPARED_CACHE_SIZE,
+                            full_overlap=False, output_format=None, batch_size=RESULT_BATCH_SIZE,
+                            checkpoint=False, resume=False, results_store=None, spatial_sort='off',
+                            state=None):
+    """Check projects against the PA index and stream the results to output_csv.
+
+    projects is a GeoJSON path (streamed) or a ProjectTable from ingest_projects().
+    With output_csv None nothing is written and the results are returned as
+    a DataFrame instead (see OverlapResultWriter).
+    With an OverlapResultStore only new or changed sources are checked; the
+    stored rows of the others are written in their place, and the store is
+    updated at the end. protected_areas_index may then be None if nothing
+    needs checking.
+
+    spatial_sort checks the projects of each SPATIAL_SORT_WINDOW in Hilbert
+    or H3 order, so consecutive projects hit the same PAs and caches, and
+    restores feature order before writing. Output (and so checkpoints)
+    advance a window at a time; with checkpointing a window is one chunk.
+    A checkpoint records state (see get_result_store_state()) and --resume
+    refuses it when this run's state differs.
+    """
     print("Processing projects to CSV...")
-    rows = []
     processed, overlaps, errors = 0, 0, 0
+    projects_geojson_file = projects.path if isinstance(projects, ProjectTable) else projects
+    columns = FULL_OVERLAP_COLUMNS if full_overlap else RESULT_COLUMNS
+    checkpoint = checkpoint or resume
+    if checkpoint and (output_csv is None or (output_format or (
+            'parquet' if output_csv.endswith('.parquet') else 'csv')) != 'csv'):
+        raise ValueError("Checkpointing and --resume need CSV output (Parquet files cannot be appended to)")
+    checkpoint_path = get_checkpoint_path(output_csv) if checkpoint else None
+    start, append_at = 0, None
+    if resume and os.path.exists(checkpoint_path):
+        saved = load_checkpoint(checkpoint_path, projects_geojson_file, columns, state)
+        start, append_at = saved['next_feature'], saved['output_bytes']
+        processed, overlaps, errors = saved['processed'], saved['overlaps'], saved['errors']
+        print(f"Resuming from feature {start} ({processed} projects already written)")
+    elif resume:
+        print(f"No checkpoint at {checkpoint_path}; starting from the beginning")
+    if results_store is not None and (checkpoint or not isinstance(projects, ProjectTable)):
+        raise ValueError("Incremental runs need an ingested ProjectTable and cannot be checkpointed")
+    if spatial_sort != 'off' and not isinstance(projects, ProjectTable):
+        raise ValueError("Spatial sorting needs an ingested ProjectTable")
+    if results_store is not None and results_store.pending is None:
+        results_store.diff(projects)
+    pending = results_store.pending if results_store is not None else None
 
-    with open(projects_geojson_file, 'rb') as f:
-        for idx, feature in enumerate(ijson.items(f, 'features.item')):
-            try:
-                geom = shape(feature['geometry'])
-                props = feature.get('properties', {})
-                project_id = props.get('id') or feature.get('id')  # support either location
-
-                project_h3 = get_h3_indices(geom)
-                pa = {
-                    'id': project_id,
-                    'PA_WDPAID': None,
-                    'PA_NAME': None,
-                    'PA_DESIG_ENG': None,
-                    'PA_IUCN_CAT': None,
-                    'PA_MARINE': None,
-                    'PA_STATUS': None,
-                    'PA_STATUS_YR': None,
-                    'PA_ISO3': None,
-                    'unep_overlap': False,
-                }
-
-                checked = set()
-                found = False
-                for cell in project_h3:
-                    if found:
-                        break
-                    for area in protected_areas_index.get(cell, []):
-                        wdpaid = area['WDPAID']
-                        if wdpaid in checked:
-                            continue
-                        checked.add(wdpaid)
-                        if geom.intersects(area['geometry']):
-                            pa.update({
-                                'PA_WDPAID': to_jsonable(area['WDPAID']),
-                                'PA_NAME': to_jsonable(area['NAME']),
-                                'PA_DESIG_ENG': to_jsonable(area['DESIG_ENG']),
-                                'PA_IUCN_CAT': to_jsonable(area['IUCN_CAT']),
-                                'PA_MARINE': to_jsonable(area['MARINE']),
-                                'PA_STATUS': to_jsonable(area['STATUS']),
-                                'PA_STATUS_YR': to_jsonable(area['STATUS_YR']),
-                                'PA_ISO3': to_jsonable(area['ISO3']),
-                                'unep_overlap': True,
-                            })
-                            found = True
-                            break
-
-                rows.append(pa)
+    context = {'protected_areas_index': protected_areas_index, 'engine': engine, 'full_overlap': full_overlap}
+    if pending is not None and not len(pending):
+        engine, prepare = 'h3', 'off'  # nothing to check, so skip building the tree or preparing
+    if engine == 'strtree':
+        context['areas'] = protected_areas_index.areas()
+        context['tree'] = STRtree([area['geometry'] for area in context['areas']])
+    if prepare == 'eager':
+        print("Preparing protected-area geometries...")
+        prepare_protected_areas(context.get('areas') or protected_areas_index.areas())
+    elif prepare == 'lazy':
+        context['prepared'] = PreparedAreaCache(prepared_cache_size)
+
+    chunk_size = chunk_size or (PROJECT_CHUNK_SIZE if workers <= 1 else WORKER_CHUNK_SIZE)
+    window_chunks = None
+    if isinstance(projects, ProjectTable):
+        if spatial_sort != 'off':
+            positions = np.arange(len(projects)) if pending is None else pending
+            positions = positions[projects.feature_idx[positions] >= start]
+            print(f"Ordering {len(positions)} projects by {spatial_sort} key...")
+            # Checkpoints are written per window, so keep windows to one chunk when checkpointing
+            windows = get_spatial_windows(projects, positions, spatial_sort, chunk_size if checkpoint else None)
+            window_chunks = [-(-len(window) // chunk_size) for window in windows]
+            chunks = (chunk for window in windows for chunk in projects.iter_chunks(chunk_size, positions=window))
+        else:
+            chunks = projects.iter_chunks(chunk_size, start, pending)
+        if append_at is None:  # counted before the first chunk, so a checkpoint's errors include them
+            for idx, message in projects.errors:
+                errors += 1
+                if errors < 20:
+                    print(f"Error on feature {idx}: {message}")
+    else:
+        chunks = iter_project_chunks(projects_geojson_file, chunk_size, start)
+    pool = None
+    if workers > 1:
+        # Workers inherit the index through fork; gc.freeze() keeps the
+        # collector from touching (and so copying) the shared pages.
+        _worker_context.clear()
+        _worker_context.update(context)
+        gc.freeze()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+        print(f"Checking overlaps with {workers} worker processes")
+        results = imap_ordered(pool, _process_project_chunk_in_worker, chunks, max_pending=2 * workers)
+    else:
+        results = (process_project_chunk(chunk, **context) for chunk in chunks)
+    if window_chunks is not None:
+        results = restore_feature_order(results, window_chunks)
+    if results_store is not None:
+        results = merge_carried_results(results, results_store.iter_carried())
+
+    writer = OverlapResultWriter(output_csv, columns, output_format, batch_size, append_at)
+    next_feature = start
+    try:
+        for chunk_results, chunk_errors in results:
+            for idx, message in chunk_errors:
+                errors += 1
+                next_feature = max(next_feature, idx + 1)
+                if errors < 20:
+                    print(f"Error on feature {idx}: {message}")
+            for idx, project_rows in chunk_results:
+                if results_store is not None:
+                    results_store.record(idx, [dict(row) for row in project_rows])
+                writer.write(project_rows, idx)
+                next_feature = max(next_feature, idx + 1)
                 processed += 1
-                if pa['unep_overlap']:
+                if project_rows[0]['unep_overlap']:
                     overlaps += 1
                 if processed % 100 == 0:
                     print(f"Processed {processed} projects...")
-            except Exception as e:
-                errors += 1
-                if errors < 20:
-                    print(f"Error on feature {idx}: {e}")
-
-    df = pd.DataFrame(rows, columns=[
-        'id',
-        'PA_WDPAID',
-        'PA_NAME',
-        'PA_DESIG_ENG',
-        'PA_IUCN_CAT',
-        'PA_MARINE',
-        'PA_STATUS',
-        'PA_STATUS_YR',
-        'PA_ISO3',
-        'unep_overlap',
-    ])
-    df.to_csv(output_csv, index=False)
+            if checkpoint:
+                # Chunks arrive whole and in order, so everything before
+                # next_feature is on disk once the writer has flushed.
+                save_checkpoint(checkpoint_path, {
+                    'projects_file': get_projects_file_stamp(projects_geojson_file),
+                    'columns': columns,
+                    'state': state,
+                    'next_feature': next_feature,
+                    'output_bytes': writer.tell(),
+                    'processed': processed,
+                    'overlaps': overlaps,
+                    'errors': errors,
+                })
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+            _worker_context.clear()
+            gc.unfreeze()
+
+    if checkpoint and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if results_store is not None:
+        results_store.save()
     print(f"\nProcessed: {processed}")
     print(f"Overlaps found: {overlaps}")
     print(f"Errors: {errors}")
-    print(f"CSV saved to: {output_csv}")
+    if writer.frame is not None:
+        return writer.frame
+    print(f"{writer.output_format.upper()} saved to: {output_csv}")
 
-def main():
-    protected_areas_file = "geojson/WDPA_Mar2025_Public_merged_polygons.geojson"
-    projects_file = "sources_20251022_195516.geojson"
-    output_csv = "projects_with_protected_areas.csv"
+def check_overlaps(projects, protected_areas_file, output=None, cache_dir=PA_CACHE_DIR, bbox_prefilter=False,
+                   incremental=None, full_overlap=False, output_format=None, batch_size=RESULT_BATCH_SIZE,
+                   **options):
+    """Load the PA index for a ProjectTable and check every project against it.
 
-    target_countries = get_target_countries_from_geojson(projects_file)
+    The command line run without the argument parsing, for pipelines that
+    keep the results in process: with output None they are returned as a
+    DataFrame. cache_dir None always re-parses the WDPA file; options are
+    passed on to process_projects_to_csv().
+    """
+    target_countries = get_target_countries(projects.countries)
     print(f"Filtering protected areas for: {target_countries}")
 
-    pa_index = load_protected_areas(protected_areas_file, target_countries)
-    process_projects_to_csv(projects_file, pa_index, output_csv)
+    state = None
+    if incremental or options.get('checkpoint') or options.get('resume'):
+        state = get_result_store_state(get_wdpa_hash(protected_areas_file), target_countries, full_overlap)
+    results_store = None
+    if incremental:
+        results_store = OverlapResultStore(incremental, state)
+        if not len(results_store.diff(projects)[1]):
+            return process_projects_to_csv(projects, None, output, full_overlap=full_overlap,
+                                           output_format=output_format, batch_size=batch_size,
+                                           results_store=results_store)
+
+    footprint = ProjectFootprint(projects.get_bounds()) if bbox_prefilter and len(projects) else None
+    bbox = None
+    if footprint is None and not target_countries and is_pa_shard_dir(protected_areas_file):
+        bbox = projects.bounds()
+    pa_index = load_protected_areas(protected_areas_file, target_countries, cache_dir=cache_dir,
+                                    bbox=bbox, footprint=footprint)
+    return process_projects_to_csv(projects, pa_index, output, full_overlap=full_overlap,
+                                   output_format=output_format, batch_size=batch_size,
+                                   results_store=results_store, state=state, **options)
+
+def main():
+    global H3_CLASSIFY_INTERIOR, H3_COVERAGE_MODE, H3_INDEX_MODE, H3_RESOLUTION, JSON_BACKEND
+    parser = argparse.ArgumentParser(description="Flag projects that overlap WDPA protected areas.")
+    parser.add_argument('--protected-areas', default="geojson/WDPA_Mar2025_Public_merged_polygons.geojson",
+                        help="WDPA GeoJSON file, or a shard directory written by partition_wdpa.py")
+    parser.add_argument('--projects', default="sources_20251022_195516.geojson")
+    parser.add_argument('--output', default="projects_with_protected_areas.csv")
+    parser.add_argument('--cache-dir', default=PA_CACHE_DIR,
+                        help="Directory for the prebuilt protected-area index (keyed by WDPA file hash)")
+    parser.add_argument('--no-cache', action='store_true', help="Always re-parse the WDPA file")
+    parser.add_argument('--h3-coverage', choices=H3_COVERAGE_MODES, default=H3_COVERAGE_MODE,
+                        help="polyfill: exact H3 coverage; sample: legacy 10x10 point grid")
+    parser.add_argument('--h3-resolution', type=int, default=H3_RESOLUTION,
+                        help="H3 resolution of project cells and of uncompacted PA cells")
+    parser.add_argument('--h3-index', choices=H3_INDEX_MODES, default=H3_INDEX_MODE,
+                        help="fixed: PA cells at --h3-resolution; multires: PA cells compacted to coarser parents")
+    parser.add_argument('--h3-interior', action='store_true',
+                        help="Tag PA cells lying fully inside the PA so projects hitting them skip exact tests")
+    parser.add_argument('--bbox-prefilter', action='store_true',
+                        help="Skip WDPA features whose bbox misses every project (the PA cache becomes project-specific)")
+    parser.add_argument('--engine', choices=JOIN_ENGINES, default='h3',
+                        help="h3: per-project H3 candidate lookup; strtree: bulk STRtree spatial join")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes for the overlap check (fork-shared index)")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f"Projects per task (default {PROJECT_CHUNK_SIZE}, or {WORKER_CHUNK_SIZE} with --workers)")
+    parser.add_argument('--spatial-sort', choices=SPATIAL_SORT_MODES, default='off',
+                        help=f"Check projects in Hilbert-curve or H3-cell order for cache locality, {SPATIAL_SORT_WINDOW} "
+                             "at a time (one chunk with --checkpoint, as output is written a window at a time); "
+                             "output keeps input order")
+    parser.add_argument('--prepare', choices=PREPARE_MODES, default='off',
+                        help="Prepare PA geometries for the h3 engine: lazily on first hit (LRU) or eagerly at load")
+    parser.add_argument('--prepared-cache-size', type=int, default=PREPARED_CACHE_SIZE,
+                        help="Max prepared PA geometries held in lazy mode")
+    parser.add_argument('--full-overlap', action='store_true',
+                        help="Write one row per (project, PA) with overlap hectares and percent of the project")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=None,
+                        help="Output format (default: parquet for a .parquet output path, else csv)")
+    parser.add_argument('--batch-size', type=int, default=RESULT_BATCH_SIZE,
+                        help="Result rows buffered before each write to the output file")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="Record progress after every chunk in <output>.checkpoint.json (CSV output only)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted --checkpoint run from its last committed feature")
+    parser.add_argument('--incremental', metavar='STORE_DIR', default=None,
+                        help="Keep results in STORE_DIR and only check sources that are new or changed since the last run")
+    parser.add_argument('--json-backend', choices=JSON_BACKENDS, default=JSON_BACKEND,
+                        help="GeoJSON parser: ijson backend for FeatureCollections, orjson/simdjson/json for GeoJSONSeq")
+    parser.add_argument('--spill-dir', default=None,
+                        help="Spill ingested project geometries to a memory-mapped file in this directory")
+    args = parser.parse_args()
+
+    H3_COVERAGE_MODE = args.h3_coverage
+    H3_INDEX_MODE = args.h3_index
+    H3_RESOLUTION = args.h3_resolution
+    H3_CLASSIFY_INTERIOR = args.h3_interior
+    JSON_BACKEND = args.json_backend
+
+    projects = ingest_projects(args.projects, spill_dir=args.spill_dir)
+    check_overlaps(projects, args.protected_areas, args.output,
+                   cache_dir=None if args.no_cache else args.cache_dir, bbox_prefilter=args.bbox_prefilter,
+                   incremental=args.incremental, full_overlap=args.full_overlap,
+                   output_format=args.output_format, batch_size=args.batch_size, engine=args.engine,
+                   workers=args.workers, chunk_size=args.chunk_size, prepare=args.prepare,
+                   prepared_cache_size=args.prepared_cache_size, checkpoint=args.checkpoint, resume=args.resume,
+                   spatial_sort=args.spatial_sort)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,220 @@
+import argparse
+import gc
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+
+import check_overlap_UNEP_geojson as overlap
+
+CONFLICT_TILE_DEG = 0.5  # partition tile size; each tile is self-joined on its own
+AREA_CHUNK_SIZE = 10000
+MIN_OVERLAP_HECTARES = 0.0  # fields that only share an edge or corner are not in conflict
+CONFLICT_COLUMNS = ['id', 'alt_id', 'country', 'custodian', 'hectares',
+                    'conflict', 'is_internal', 'percent_overlap', 'conflict_count']
+PAIR_COLUMNS = ['id_a', 'id_b', 'custodian_a', 'custodian_b', 'is_internal',
+                'overlap_hectares', 'percent_overlap_a', 'percent_overlap_b']
+
+_worker_context = {}
+
+
+def get_geometries(sources, positions):
+    """Decode the WKB of the given table rows, repairing invalid polygons."""
+    geoms = shapely.from_wkb([sources.get_wkb(i) for i in positions])
+    invalid = ~shapely.is_valid(geoms)
+    if invalid.any():
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+    return geoms
+
+def assign_tiles(bounds, tile_deg=CONFLICT_TILE_DEG):
+    """[(tile, positions)] for every grid tile touched by a source bbox, in tile order.
+
+    A source is listed in each tile its bbox touches; most fields are much
+    smaller than a tile and land in exactly one.
+    """
+    lo = np.floor(bounds[:, :2] / tile_deg).astype(np.int64)
+    hi = np.floor(bounds[:, 2:] / tile_deg).astype(np.int64)
+    single = (lo == hi).all(axis=1)
+    tile_x, tile_y, positions = [lo[single, 0]], [lo[single, 1]], [np.flatnonzero(single)]
+    for i in np.flatnonzero(~single):
+        xs, ys = np.meshgrid(np.arange(lo[i, 0], hi[i, 0] + 1), np.arange(lo[i, 1], hi[i, 1] + 1))
+        tile_x.append(xs.ravel())
+        tile_y.append(ys.ravel())
+        positions.append(np.full(xs.size, i))
+    tile_x, tile_y, positions = np.concatenate(tile_x), np.concatenate(tile_y), np.concatenate(positions)
+    order = np.lexsort((positions, tile_y, tile_x))
+    tile_x, tile_y, positions = tile_x[order], tile_y[order], positions[order]
+    starts = np.flatnonzero(np.r_[True, (tile_x[1:] != tile_x[:-1]) | (tile_y[1:] != tile_y[:-1])])
+    ends = np.r_[starts[1:], len(positions)]
+    return [((int(tile_x[s]), int(tile_y[s])), positions[s:e]) for s, e in zip(starts, ends)]
+
+def measure_hectares(positions):
+    return overlap.equal_area_hectares(get_geometries(_worker_context['sources'], positions))
+
+def find_tile_conflicts(task):
+    """(a, b, overlap hectares) arrays for the overlapping source pairs owned by one tile.
+
+    The tile is self-joined with an STRtree. A pair is owned by the tile
+    holding the lower-left corner of the intersection of the two bboxes, so
+    pairs seen by several tiles are reported exactly once.
+    """
+    (tile_x, tile_y), positions = task
+    bounds, tile_deg = _worker_context['bounds'], _worker_context['tile_deg']
+    geoms = get_geometries(_worker_context['sources'], positions)
+    left, right = overlap.strtree_join(geoms, STRtree(geoms))
+    keep = left < right
+    left, right = left[keep], right[keep]
+    a, b = positions[left], positions[right]
+    corner = np.floor(np.maximum(bounds[a, :2], bounds[b, :2]) / tile_deg).astype(np.int64)
+    owned = (corner[:, 0] == tile_x) & (corner[:, 1] == tile_y)
+    left, right, a, b = left[owned], right[owned], a[owned], b[owned]
+    overlap_hectares = overlap.equal_area_hectares(shapely.intersection(geoms[left], geoms[right]))
+    keep = overlap_hectares > MIN_OVERLAP_HECTARES
+    return a[keep], b[keep], overlap_hectares[keep]
+
+def measure_union_overlap(task):
+    """Hectares of each source covered by the union of its conflicting sources."""
+    sources = _worker_context['sources']
+    hectares = []
+    for position, partners in task:
+        geom, others = get_geometries(sources, [position])[0], get_geometries(sources, partners)
+        hectares.append(overlap.equal_area_hectares(shapely.intersection(geom, shapely.union_all(others))))
+    return hectares
+
+def iter_chunks(items, chunk_size):
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+def check_source_conflicts(sources, output_csv, pairs_csv=None, custodian_property='custodian',
+                           tile_deg=CONFLICT_TILE_DEG, workers=1, spill_dir=None):
+    """Find every pair of overlapping sources and write one conflict row per source.
+
+    sources is a GeoJSON path or a ProjectTable ingested with the alt_id and
+    custodian properties. percent_overlap is the fraction of a source's
+    area covered by other sources; is_internal is True when every
+    conflicting source has the same custodian, False when any has another
+    one, and empty without a conflict. The returned DataFrame is indexed by
+    feature idx; with output_csv None it is not written.
+    """
+    if not isinstance(sources, overlap.ProjectTable):
+        sources = overlap.ingest_projects(sources, spill_dir, properties=('alt_id', custodian_property))
+    n = len(sources)
+    bounds = sources.get_bounds()
+    tiles = assign_tiles(bounds, tile_deg) if n else []
+    print(f"Partitioned {n} sources into {len(tiles)} tiles of {tile_deg} degrees")
+
+    _worker_context.update({'sources': sources, 'bounds': bounds, 'tile_deg': tile_deg})
+    pool = None
+    if workers > 1:
+        # Workers inherit the source table through fork, as in check_overlap_UNEP_geojson.py.
+        gc.freeze()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+        print(f"Checking conflicts with {workers} worker processes")
+    imap = pool.imap if pool is not None else map
+    try:
+        hectares = np.concatenate([np.zeros(0)] + list(
+            imap(measure_hectares, iter_chunks(np.arange(n), AREA_CHUNK_SIZE))))
+
+        a, b, pair_hectares = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+        for done, (tile_a, tile_b, tile_hectares) in enumerate(imap(find_tile_conflicts, tiles), 1):
+            a.append(tile_a)
+            b.append(tile_b)
+            pair_hectares.append(tile_hectares)
+            if done % 100 == 0:
+                print(f"Checked {done}/{len(tiles)} tiles...")
+        a, b, pair_hectares = np.concatenate(a), np.concatenate(b), np.concatenate(pair_hectares)
+        order = np.lexsort((b, a))
+        a, b, pair_hectares = a[order], b[order], pair_hectares[order]
+        print(f"Found {len(a)} overlapping source pairs")
+
+        # Sources with one conflict take the pairwise overlap; the rest need
+        # the union of their partners so shared slivers are not counted twice.
+        ends, partners = np.concatenate([a, b]), np.concatenate([b, a])
+        conflict_count = np.bincount(ends, minlength=n)
+        overlap_hectares = np.bincount(ends, weights=np.concatenate([pair_hectares, pair_hectares]), minlength=n)
+        multi = np.flatnonzero(conflict_count > 1)
+        if len(multi):
+            order = np.argsort(ends, kind='stable')
+            ends, partners = ends[order], partners[order]
+            starts = np.searchsorted(ends, multi)
+            tasks = [(int(p), partners[s:s + conflict_count[p]]) for p, s in zip(multi, starts)]
+            overlap_hectares[multi] = np.concatenate(
+                list(imap(measure_union_overlap, iter_chunks(tasks, AREA_CHUNK_SIZE // 10))))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+            gc.unfreeze()
+        _worker_context.clear()
+
+    custodians = np.array(sources.properties[custodian_property], dtype=object)
+    pair_internal = np.array([x is not None and x == y for x, y in zip(custodians[a], custodians[b])], dtype=bool)
+    external_count = np.bincount(np.concatenate([a[~pair_internal], b[~pair_internal]]), minlength=n)
+    conflict = conflict_count > 0
+    is_internal = pd.array(external_count == 0, dtype='boolean')
+    is_internal[~conflict] = pd.NA
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_overlap = np.where(hectares > 0, np.minimum(overlap_hectares / hectares, 1.0), 0.0)
+
+    df = pd.DataFrame({
+        'id': sources.ids,
+        'alt_id': sources.properties['alt_id'],
+        'country': sources.countries,
+        'custodian': custodians,
+        'hectares': hectares,
+        'conflict': conflict,
+        'is_internal': is_internal,
+        'percent_overlap': percent_overlap,
+        'conflict_count': conflict_count,
+    }, columns=CONFLICT_COLUMNS, index=pd.Index(sources.feature_idx, name='feature'))
+    if output_csv:
+        df.to_csv(output_csv, index=False)
+
+    if pairs_csv:
+        ids = np.array(sources.ids, dtype=object)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pairs = pd.DataFrame({
+                'id_a': ids[a],
+                'id_b': ids[b],
+                'custodian_a': custodians[a],
+                'custodian_b': custodians[b],
+                'is_internal': pair_internal,
+                'overlap_hectares': pair_hectares,
+                'percent_overlap_a': np.where(hectares[a] > 0, pair_hectares / hectares[a], 0.0),
+                'percent_overlap_b': np.where(hectares[b] > 0, pair_hectares / hectares[b], 0.0),
+            }, columns=PAIR_COLUMNS)
+        pairs.to_csv(pairs_csv, index=False)
+        print(f"Pairs saved to: {pairs_csv}")
+
+    print(f"\nSources: {n}")
+    print(f"Sources with conflicts: {int(conflict.sum())} "
+          f"(internal {int((conflict & (external_count == 0)).sum())}, external {int((external_count > 0).sum())})")
+    print(f"Errors: {len(sources.errors)}")
+    if output_csv:
+        print(f"CSV saved to: {output_csv}")
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag sources whose boundaries overlap other sources.")
+    parser.add_argument('--sources', default="sources_20251022_195516.geojson")
+    parser.add_argument('--output', default="sources_with_conflicts.csv")
+    parser.add_argument('--pairs-output', default=None, help="Also write one row per overlapping pair")
+    parser.add_argument('--custodian-property', default='custodian',
+                        help="Feature property naming the custodian; equal custodians make a conflict internal")
+    parser.add_argument('--tile-deg', type=float, default=CONFLICT_TILE_DEG,
+                        help="Size of the lon/lat tiles the self-join is partitioned into")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes (fork-shared source table)")
+    parser.add_argument('--json-backend', choices=overlap.JSON_BACKENDS, default=overlap.JSON_BACKEND)
+    parser.add_argument('--spill-dir', default=None,
+                        help="Spill ingested geometries to a memory-mapped file in this directory")
+    args = parser.parse_args()
+
+    overlap.JSON_BACKEND = args.json_backend
+    check_source_conflicts(args.sources, args.output, args.pairs_output, args.custodian_property,
+                           args.tile_deg, args.workers, args.spill_dir)
+
+if __name__ == "__main__":
+    main()
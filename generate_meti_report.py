@@ -2,15 +2,66 @@
 
 import pandas as pd
 import os
+import argparse
+import csv
+import multiprocessing
+import json
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.shared import Pt
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from docx.oxml.ns import qn, nsdecls
+from docx.oxml import OxmlElement, parse_xml
+from docx.enum.style import WD_STYLE_TYPE
+from xml.sax.saxutils import escape
+import re
 from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime
 
+try:
+    import pyarrow  # multithreaded CSV parsing and Parquet input
+except ImportError:
+    pyarrow = None
+try:
+    import xlsxwriter  # constant-memory XLSX appendix
+except ImportError:
+    xlsxwriter = None
+
+HIGH_OVERLAP_THRESHOLD = 0.02  # internal conflicts at or above this overlap fraction need a deduction
+DEFAULT_CUSTODIAN = 'Cargill'
+REPORT_FILENAME = 'meti_ssid_registration_report.docx'
+# Report columns of the last CSV read (Parquet) and the key they are valid for (JSON)
+STATS_CACHE_FILENAME = '.meti_report_stats.parquet'
+STATS_CACHE_MANIFEST = '.meti_report_stats.json'
+STATS_CACHE_VERSION = 2  # bump when loading or aggregating the report data changes
+# Columns the report reads and the dtypes they are loaded with
+REPORT_DTYPES = {
+    'id': 'string',
+    'alt_id': 'string',
+    'country': 'category',
+    'hectares': 'float64',
+    'percent_overlap': 'float64',
+    'conflict': 'boolean',
+    'is_internal': 'boolean',
+    'unep_overlap': 'boolean',
+    'pa_name': 'category',
+    'pa_designation': 'category',
+}
+TABLE_STYLE = 'METI Table'  # Table Grid plus the table font, so cells need no per-run formatting
+XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+APPENDIX_FORMATS = ('xlsx', 'csv')
+APPENDIX_CHUNK_ROWS = 10000  # rows converted to Python values at a time while writing an appendix
+XLSX_MAX_ROWS = 1048576  # per sheet, header included; longer tables continue on further sheets
+CONFLICT_TABLE_HEADERS = ['Source ID', 'Alt ID', 'Country', 'Overlap %', 'Area (Hectares)']
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
 def hectares_to_acres(hectares):
     return hectares * 2.47105
 
@@ -31,27 +82,378 @@ def add_logo(doc):
         doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
         doc.add_paragraph()  # Add space after logo
 
-def set_table_font(table, font_name='Open Sans', size=10):
-    for row in table.rows:
-        for cell in row.cells:
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.font.name = font_name
-                    run.font.size = Pt(size)
-                if not paragraph.runs:  # If no runs exist, create one
-                    run = paragraph.add_run(paragraph.text)
-                    run.font.name = font_name
-                    run.font.size = Pt(size)
-                    paragraph.text = ''  # Clear original text
-
-def analyze_data(csv_path):
+def get_table_style(doc, font_name='Open Sans', size=10):
+    """The report's table style, added to doc on first use."""
+    if TABLE_STYLE not in [style.name for style in doc.styles]:
+        style = doc.styles.add_style(TABLE_STYLE, WD_STYLE_TYPE.TABLE)
+        style.base_style = doc.styles['Table Grid']
+        style.font.name = font_name
+        style.font.size = Pt(size)
+    return doc.styles[TABLE_STYLE]
+
+def cell_xml(text, width, bold=False):
+    text = escape(XML_INVALID_CHARS.sub('', text))
+    run_props = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    # Only where needed, as python-docx does: moving thousands of xml:space
+    # attributes into the document tree is very slow in lxml.
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return (f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+            f'<w:p><w:r>{run_props}<w:t{space}>{text}</w:t></w:r></w:p></w:tc>')
+
+def add_bulk_table(doc, headers, columns):
+    """Append a table built as one XML fragment from a bold header row and column sequences of text.
+
+    Equivalent to add_table()/add_row() per row, but the whole table is
+    parsed once and fonts come from the table style, so large tables render
+    in a fraction of the time and memory.
+    """
+    style = get_table_style(doc)
+    section = doc.sections[-1]
+    width = int((section.page_width - section.left_margin - section.right_margin) / len(headers) / 635)  # EMU to twips
+    header_row = '<w:tr><w:trPr><w:tblHeader/></w:trPr>' + ''.join(cell_xml(h, width, bold=True) for h in headers) + '</w:tr>'
+    body_rows = ''.join('<w:tr>' + ''.join(cell_xml(str(value), width) for value in row) + '</w:tr>'
+                        for row in zip(*columns))
+    tbl = parse_xml(
+        f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblStyle w:val="{style.style_id}"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        '</w:tblPr><w:tblGrid>' + f'<w:gridCol w:w="{width}"/>' * len(headers) + '</w:tblGrid>'
+        + header_row + body_rows + '</w:tbl>')
+    body = doc.element.body
+    if body.sectPr is not None:
+        body.sectPr.addprevious(tbl)
+    else:
+        body.append(tbl)
+    return tbl
+
+def text_or_dash(series):
+    """str() of each value, or '-' where it is missing."""
+    return [str(value) if pd.notna(value) else '-' for value in series]
+
+def value_or_none(series):
+    """Plain Python values for an appendix, with None where missing (a blank cell)."""
+    return [value if pd.notna(value) else None for value in series.astype(object)]
+
+def iter_appendix_rows(columns, chunk_rows=APPENDIX_CHUNK_ROWS):
+    """Rows of plain values from column Series, converting chunk_rows at a time."""
+    n = len(columns[0]) if columns else 0
+    for start in range(0, n, chunk_rows):
+        yield from zip(*(value_or_none(column.iloc[start:start + chunk_rows]) for column in columns))
+
+class ReportAppendix:
+    """Companion file with the full rows of every table cut short in the DOCX.
+
+    XLSX gets one sheet per table, written by xlsxwriter in constant-memory
+    mode so rows go to disk as they are written; CSV gets one file per
+    table. Rows are converted from the column Series in chunks. Nothing
+    is created until the first table is added.
+    """
+
+    def __init__(self, base_path, output_format=None):
+        self.base_path = base_path
+        self.output_format = output_format or ('xlsx' if xlsxwriter is not None else 'csv')
+        if self.output_format == 'xlsx' and xlsxwriter is None:
+            raise ImportError("XLSX appendices require xlsxwriter")
+        self.paths = []
+        self._locations = {}
+        self._workbook = None
+
+    def add_table(self, name, get_table):
+        """Write the table get_table() -> (headers, column Series) once; where to find it, for the report text."""
+        if name in self._locations:
+            return self._locations[name]
+        headers, columns = get_table()
+        if self.output_format == 'xlsx':
+            if self._workbook is None:
+                self.paths.append(self.base_path + '.xlsx')
+                self._workbook = xlsxwriter.Workbook(self.paths[-1], {'constant_memory': True})
+                self._bold = self._workbook.add_format({'bold': True})
+            sheet, sheets, row_number = None, 0, XLSX_MAX_ROWS
+            for row in iter_appendix_rows(columns):
+                if row_number == XLSX_MAX_ROWS:
+                    sheets += 1
+                    suffix = f' ({sheets})' if sheets > 1 else ''
+                    sheet = self._workbook.add_worksheet(name[:31 - len(suffix)] + suffix)
+                    sheet.write_row(0, 0, headers, self._bold)
+                    row_number = 1
+                sheet.write_row(row_number, 0, row)
+                row_number += 1
+            location = f"sheet '{name[:31]}' of {os.path.basename(self.paths[-1])}"
+            if sheets > 1:
+                location = f"sheets '{name[:31]}' to '{sheet.name}' of {os.path.basename(self.paths[-1])}"
+        else:
+            path = f"{self.base_path}_{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_').lower()}.csv"
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(headers)
+                writer.writerows(iter_appendix_rows(columns))
+            self.paths.append(path)
+            location = os.path.basename(path)
+        self._locations[name] = location
+        return location
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+        for path in self.paths:
+            print(f"Appendix saved to: {path}")
+
+def add_source_table(doc, df, headers, get_columns, rank_by, max_rows=None, appendix=None, appendix_table=None,
+                     rank_label='overlap'):
+    """Add a table of one row per source, keeping only the max_rows largest by rank_by if there are more.
+
+    get_columns(df) gives the table's text columns. When rows are cut, the
+    full table appendix_table = (name, get_table) goes to the appendix and
+    a note under the table points to it.
+    """
+    if max_rows is None or len(df) <= max_rows:
+        add_bulk_table(doc, headers, get_columns(df))
+        return
+    top = df.sort_values(rank_by, ascending=False, kind='stable').head(max_rows)
+    add_bulk_table(doc, headers, get_columns(top))
+    location = appendix.add_table(*appendix_table)
+    note = doc.add_paragraph()
+    note.add_run(f"Showing the {max_rows:,} of {len(df):,} sources with the largest {rank_label}; "
+                 f"all {len(df):,} are listed in {location}.").font.name = 'Open Sans'
+
+def get_appendix_path(output_filename):
+    return os.path.splitext(output_filename)[0] + '_appendix'
+
+def get_conflict_columns(df):
+    return [
+        df['id'].astype(str),
+        text_or_dash(df['alt_id']),
+        text_or_dash(df['country']),
+        [f"{value*100:.2f}%" for value in df['percent_overlap']],
+        [format_number(value) for value in df['hectares']],
+    ]
+
+def get_conflict_detail(df):
+    return CONFLICT_TABLE_HEADERS, [df['id'], df['alt_id'], df['country'], df['percent_overlap'] * 100, df['hectares']]
+
+def get_protected_columns(df):
+    return [
+        df['id'].astype(str),
+        text_or_dash(df['alt_id']),
+        text_or_dash(df['pa_name']),
+        [format_number(value) for value in df['hectares']],
+    ]
+
+def get_protected_detail(frames):
+    df = pd.concat(frames) if frames else pd.DataFrame(columns=list(REPORT_DTYPES))
+    return ['Country', 'Source ID', 'Alt ID', 'Protected Area', 'Designation', 'Area (Hectares)'], [
+        df['country'], df['id'], df['alt_id'], df['pa_name'], df['pa_designation'], df['hectares']]
+
+@dataclass
+class ReportStats:
+    """Every figure and table slice the report needs, computed once from the sources DataFrame."""
+    total_sources: int
+    total_hectares: float
+    unique_sources: int
+    sources_with_conflicts: int
+    internal_conflicts: int
+    external_conflicts: int
+    sources_with_protected: int
+    high_overlap_conflicts: pd.DataFrame
+    external_conflicts_df: pd.DataFrame
+    countries: list
+    by_country: pd.DataFrame
+    country_pas: dict
+    protected_by_country: dict
+
+def load_report_data(source, extra_columns=None):
+    """Only the report columns of a sources DataFrame, CSV or Parquet file, with explicit dtypes.
+
+    extra_columns maps further columns to load (e.g. the custodian) to dtypes.
+    Flags become nullable booleans, ids nullable strings and repeated labels
+    categoricals. CSVs are parsed with pyarrow's multithreaded reader when
+    it is installed.
+    """
+    dtypes = {**REPORT_DTYPES, **(extra_columns or {})}
+    is_frame = isinstance(source, pd.DataFrame)
+    if is_frame:
+        df = source
+    elif source.endswith('.parquet'):
+        df = pd.read_parquet(source, columns=list(dtypes))
+    else:
+        columns = [column for column in pd.read_csv(source, nrows=0).columns if column in dtypes]
+        df = pd.read_csv(source, usecols=columns, dtype={column: dtypes[column] for column in columns},
+                         engine='pyarrow' if pyarrow is not None else 'c')
+    missing = [column for column in dtypes if column not in df.columns]
+    if missing:
+        raise ValueError(f"{'DataFrame' if is_frame else source} is missing report columns: {missing}")
+    df = df[list(dtypes)]
+    if is_frame or source.endswith('.parquet'):
+        df = df.astype(dtypes)
+    return df
+
+def flag_mask(series, value=True):
+    """Rows whose flag equals value, as a plain bool array (missing flags match neither)."""
+    return (series == value).fillna(False).to_numpy(dtype=bool)
+
+def sort_countries(countries):
+    return sorted(countries, key=lambda x: str(x) if pd.notna(x) else '')
+
+def compute_report_stats(df):
+    """Build ReportStats with one pass of boolean masks and a single groupby over country."""
+    conflict = flag_mask(df['conflict'])
+    internal = flag_mask(df['is_internal'])
+    protected = flag_mask(df['unep_overlap'])
+    high_overlap = internal & (df['percent_overlap'] >= HIGH_OVERLAP_THRESHOLD).to_numpy()
+
+    flags = pd.DataFrame({'country': df['country'], 'conflict': conflict, 'internal': internal,
+                          'protected': protected, 'hectares': df['hectares']})
+    by_country = flags.groupby('country', sort=False, observed=True).agg(
+        total=('conflict', 'size'), conflicts=('conflict', 'sum'), internal=('internal', 'sum'),
+        protected=('protected', 'sum'), hectares=('hectares', 'sum'))
+    by_country['external'] = by_country['conflicts'] - by_country['internal']
+    countries = sort_countries(by_country.index)
+
+    # Distinct (name, designation) pairs per country, in order of first appearance
+    pas = df[['country', 'pa_name', 'pa_designation']].dropna(subset=['country'])
+    pas = pas.dropna(subset=['pa_name', 'pa_designation'], how='all').drop_duplicates()
+    country_pas = {country: group[['pa_name', 'pa_designation']]
+                   for country, group in pas.groupby('country', sort=False, observed=True)}
+    protected_sources = df[protected]
+    protected_by_country = {country: group for country, group in
+                            protected_sources.groupby('country', sort=False, observed=True)}
+
+    sources_with_conflicts = int(conflict.sum())
+    internal_conflicts = int(internal.sum())
+    return ReportStats(
+        total_sources=len(df),
+        total_hectares=df['hectares'].sum(),
+        unique_sources=int(flag_mask(df['conflict'], False).sum()),
+        sources_with_conflicts=sources_with_conflicts,
+        internal_conflicts=internal_conflicts,
+        external_conflicts=sources_with_conflicts - internal_conflicts,
+        sources_with_protected=int(protected.sum()),
+        high_overlap_conflicts=df[high_overlap],
+        external_conflicts_df=df[flag_mask(df['is_internal'], False)],
+        countries=countries,
+        by_country=by_country,
+        country_pas=country_pas,
+        protected_by_country=protected_by_country,
+    )
+
+def compute_custodian_stats(df, custodian_column='custodian'):
+    """{custodian: ReportStats}, splitting the sources once with a groupby over custodian."""
+    return {custodian: compute_report_stats(group)
+            for custodian, group in df.groupby(custodian_column, sort=True, observed=True)}
+
+def get_csv_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def get_stats_cache_key(csv_path, custodian_column):
+    """Everything the cached report data depends on: the CSV, the loading code and its settings."""
+    return {
+        'version': STATS_CACHE_VERSION,
+        'csv': get_csv_stamp(csv_path),
+        'custodian_column': custodian_column,
+        'high_overlap_threshold': HIGH_OVERLAP_THRESHOLD,
+        'dtypes': {column: getattr(dtype, '__name__', dtype) for column, dtype in REPORT_DTYPES.items()},
+    }
+
+def load_custodian_stats(csv_path, custodian_column='custodian', cache_dir=None):
+    """Per-custodian stats for a sources CSV, reading it from the cache in cache_dir while the key matches.
+
+    The cache is a Parquet copy of the loaded report columns (data only, so
+    a planted file cannot run code) plus a JSON manifest holding the key;
+    it needs pyarrow. csv_path may also be a sources DataFrame, which is
+    never cached.
+    """
+    extra_columns = {custodian_column: 'category'}
+    if isinstance(csv_path, pd.DataFrame):
+        return compute_custodian_stats(load_report_data(csv_path, extra_columns), custodian_column)
+    cache_path = os.path.join(cache_dir, STATS_CACHE_FILENAME) if cache_dir and pyarrow is not None else None
+    manifest_path = os.path.join(cache_dir, STATS_CACHE_MANIFEST) if cache_path else None
+    key = get_stats_cache_key(csv_path, custodian_column)
+    if cache_path and os.path.exists(cache_path) and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            cached_key = json.load(f)
+        if cached_key == key:
+            print(f"Loaded cached report data: {cache_path}")
+            return compute_custodian_stats(load_report_data(cache_path, extra_columns), custodian_column)
+
     print(f"Reading CSV file: {csv_path}")
-    
-    # Read the CSV file
-    df = pd.read_csv(csv_path)
+    df = load_report_data(csv_path, extra_columns)
     print("CSV loaded successfully")
-    
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(cache_path, index=False)
+        with open(manifest_path, 'w') as f:
+            json.dump(key, f, indent=2)
+    return compute_custodian_stats(df, custodian_column)
+
+def get_report_filename(custodian, output_dir='.'):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', str(custodian)).strip('_') or 'unknown'
+    return os.path.join(output_dir, f"meti_ssid_registration_report_{slug}.docx")
+
+_batch_stats = {}  # custodian -> ReportStats, inherited by forked report workers
+
+def _render_custodian_report(task):
+    custodian, output_filename, max_table_rows, appendix_format = task
+    build_report(_batch_stats[custodian], custodian, output_filename, max_table_rows, appendix_format)
+    return output_filename
+
+def generate_batch_reports(csv_path, output_dir='.', custodians=None, custodian_column='custodian', workers=1,
+                           max_table_rows=None, appendix_format=None):
+    """One report per custodian from a single read and aggregation of the CSV.
+
+    The loaded report columns are cached in output_dir, so rerunning for
+    other members skips parsing the CSV; reports are rendered in forked
+    worker processes.
+    csv_path may also be a sources DataFrame.
+    """
+    stats = load_custodian_stats(csv_path, custodian_column, cache_dir=output_dir)
+    custodians = list(stats) if custodians is None else custodians
+    missing = [c for c in custodians if c not in stats]
+    if missing:
+        print(f"No sources for custodians: {missing}")
+    tasks = [(c, get_report_filename(c, output_dir), max_table_rows, appendix_format)
+             for c in custodians if c in stats]
+    os.makedirs(output_dir, exist_ok=True)
+
+    _batch_stats.clear()
+    _batch_stats.update(stats)
+    try:
+        if workers > 1:
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                filenames = list(pool.imap_unordered(_render_custodian_report, tasks))
+        else:
+            filenames = [_render_custodian_report(task) for task in tasks]
+    finally:
+        _batch_stats.clear()
+    print(f"Generated {len(filenames)} reports in {output_dir}")
+    return filenames
+
+def analyze_data(csv_path, custodian=DEFAULT_CUSTODIAN, output_filename=REPORT_FILENAME, max_table_rows=None,
+                 appendix_format=None):
+    """Write the report for a sources CSV or Parquet path, or for a sources DataFrame already in memory."""
+    if isinstance(csv_path, pd.DataFrame):
+        df = load_report_data(csv_path)
+    else:
+        print(f"Reading CSV file: {csv_path}")
+
+        # Read the CSV file
+        df = load_report_data(csv_path)
+        print("CSV loaded successfully")
+    build_report(compute_report_stats(df), custodian, output_filename, max_table_rows, appendix_format)
+
+def build_report(stats, custodian=DEFAULT_CUSTODIAN, output_filename=REPORT_FILENAME, max_table_rows=None,
+                 appendix_format=None):
+    """Render the SSID registration report for one custodian from its ReportStats.
+
+    With max_table_rows, per-source tables keep their top rows and the
+    full tables go to an XLSX or CSV appendix next to the report.
+    """
     doc = Document()
+    if max_table_rows is not None and max_table_rows < 1:
+        raise ValueError(f"max_table_rows must be at least 1, not {max_table_rows}")
+    appendix = None
+    if max_table_rows is not None:
+        appendix = ReportAppendix(get_appendix_path(output_filename), appendix_format)
     
     # Add logo
     add_logo(doc)
@@ -66,7 +468,7 @@ def analyze_data(csv_path):
     # Add report metadata
     metadata = [
         ('Issued By:', 'METI™ Administrators'),
-        ('Issued To:', 'Cargill'),
+        ('Issued To:', custodian),
         ('Date:', datetime.now().strftime('%m-%d-%Y'))
     ]
     
@@ -79,7 +481,7 @@ def analyze_data(csv_path):
     
     # Add report introduction
     intro = doc.add_paragraph()
-    intro_run = intro.add_run("This report has been prepared at the request of Cargill, a METI™ Member. It provides verification of the registration, uniqueness, and conflict status of digital deeds called Secure Source IDs (SSIDs) on the MillPont Environmental Trust Infrastructure (METI™) platform.")
+    intro_run = intro.add_run(f"This report has been prepared at the request of {custodian}, a METI™ Member. It provides verification of the registration, uniqueness, and conflict status of digital deeds called Secure Source IDs (SSIDs) on the MillPont Environmental Trust Infrastructure (METI™) platform.")
     intro_run.font.name = 'Open Sans'
     
     platform_desc = doc.add_paragraph()
@@ -91,7 +493,7 @@ def analyze_data(csv_path):
     # Add Verification Scope section
     doc.add_heading('Verification Scope', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
     scope = doc.add_paragraph()
-    scope_run = scope.add_run("The scope of this report includes the verification of Secure Source IDs registered by Cargill on the METI™ platform. It addresses the following aspects:")
+    scope_run = scope.add_run(f"The scope of this report includes the verification of Secure Source IDs registered by {custodian} on the METI™ platform. It addresses the following aspects:")
     scope_run.font.name = 'Open Sans'
     
     scope_items = [
@@ -118,10 +520,10 @@ def analyze_data(csv_path):
     doc.add_heading('Verification Details', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
     
     details = [
-        ('Member Name:', 'Cargill'),
-        ('Number of Secure Source IDs Registered:', f"{len(df):,}"),
-        ('Unique Secure Source IDs (no potential conflict detected):', f"{len(df[df['conflict'] == False]):,}"),
-        ('Potential Conflicts Detected (pending resolution):', f"{len(df[df['conflict'] == True]):,} (~{len(df[df['conflict'] == True])/len(df)*100:.1f}%)")
+        ('Member Name:', custodian),
+        ('Number of Secure Source IDs Registered:', f"{stats.total_sources:,}"),
+        ('Unique Secure Source IDs (no potential conflict detected):', f"{stats.unique_sources:,}"),
+        ('Potential Conflicts Detected (pending resolution):', f"{stats.sources_with_conflicts:,} (~{stats.sources_with_conflicts/stats.total_sources*100:.1f}%)")
     ]
     
     for label, value in details:
@@ -133,7 +535,7 @@ def analyze_data(csv_path):
     # Add Analysis section
     doc.add_heading('Analysis', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
     analysis = doc.add_paragraph()
-    analysis_run = analysis.add_run(f"As part of routine verification, the system flagged {len(df[df['conflict'] == True]):,} of {len(df):,} SSIDs for \"potential conflicts.\" These potential conflicts are indications, not conclusions, and require further review by the Member, affiliated data stakeholders and METI™ Administration. They can arise from several scenarios, including:")
+    analysis_run = analysis.add_run(f"As part of routine verification, the system flagged {stats.sources_with_conflicts:,} of {stats.total_sources:,} SSIDs for \"potential conflicts.\" These potential conflicts are indications, not conclusions, and require further review by the Member, affiliated data stakeholders and METI™ Administration. They can arise from several scenarios, including:")
     analysis_run.font.name = 'Open Sans'
     
     conflict_scenarios = [
@@ -166,7 +568,7 @@ def analyze_data(csv_path):
         p.add_run(standard).font.name = 'Open Sans'
     
     declaration = doc.add_paragraph()
-    declaration_run = declaration.add_run(f"This report affirms that the Secure Source IDs listed under Cargill meet the platform's standards for registration, uniqueness, and conflict-free status, except as noted in the conflict details above.")
+    declaration_run = declaration.add_run(f"This report affirms that the Secure Source IDs listed under {custodian} meet the platform's standards for registration, uniqueness, and conflict-free status, except as noted in the conflict details above.")
     declaration_run.font.name = 'Open Sans'
     
     # Add Signature section
@@ -190,9 +592,9 @@ def analyze_data(csv_path):
         run.font.name = 'Open Sans'
     
     # Add custodian
-    custodian = doc.add_paragraph()
-    custodian.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    custodian_run = custodian.add_run('Custodian: Cargill')
+    custodian_paragraph = doc.add_paragraph()
+    custodian_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    custodian_run = custodian_paragraph.add_run(f'Custodian: {custodian}')
     custodian_run.font.name = 'Open Sans'
     custodian_run.bold = True
     
@@ -214,21 +616,14 @@ def analyze_data(csv_path):
 
     # Overall Summary
     doc.add_heading('Overall Summary', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
-    total_sources = len(df)
-    total_hectares = df['hectares'].sum()
+    total_sources = stats.total_sources
+    total_hectares = stats.total_hectares
     total_acres = hectares_to_acres(total_hectares)
-    
-    # Get conflict and protected area statistics
-    sources_with_conflicts = len(df[df['conflict'] == True])
-    sources_with_protected = len(df[df['unep_overlap'] == True])
-    
-    # Get internal vs external conflict breakdown
-    internal_conflicts = len(df[df['is_internal'] == True])
-    external_conflicts = sources_with_conflicts - internal_conflicts
-    
-    # Get internal conflicts with >=2% overlap
-    internal_conflicts_df = df[df['is_internal'] == True]
-    high_overlap_conflicts = internal_conflicts_df[internal_conflicts_df['percent_overlap'] >= 0.02]
+    sources_with_conflicts = stats.sources_with_conflicts
+    sources_with_protected = stats.sources_with_protected
+    internal_conflicts = stats.internal_conflicts
+    external_conflicts = stats.external_conflicts
+    high_overlap_conflicts = stats.high_overlap_conflicts
     
     summary = doc.add_paragraph()
     summary_run = summary.add_run('Total Sources: ')
@@ -270,20 +665,11 @@ def analyze_data(csv_path):
     doc.add_heading('Protected Areas Analysis', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
     
     # Create table for protected areas overlaps
-    table = doc.add_table(rows=1, cols=3)
-    table.style = 'Table Grid'
-    header_cells = table.rows[0].cells
-    headers = ['Total Sources', 'Protected Area Overlaps', 'Overlap Percentage']
-    for i, header in enumerate(headers):
-        header_cells[i].text = header
-        header_cells[i].paragraphs[0].runs[0].bold = True
-    
-    row_cells = table.add_row().cells
-    row_cells[0].text = f"{total_sources:,}"
-    row_cells[1].text = f"{sources_with_protected:,}"
-    row_cells[2].text = f"{(sources_with_protected/total_sources)*100:.1f}%"
-    
-    set_table_font(table)
+    add_bulk_table(doc, ['Total Sources', 'Protected Area Overlaps', 'Overlap Percentage'], [
+        [f"{total_sources:,}"],
+        [f"{sources_with_protected:,}"],
+        [f"{(sources_with_protected/total_sources)*100:.1f}%"],
+    ])
     doc.add_paragraph()
 
     # High Overlap Conflicts Analysis
@@ -299,28 +685,13 @@ def analyze_data(csv_path):
         doc.add_paragraph()
         
         # Create table for high overlap conflicts
-        table = doc.add_table(rows=1, cols=5)
-        table.style = 'Table Grid'
-        header_cells = table.rows[0].cells
-        headers = ['Source ID', 'Alt ID', 'Country', 'Overlap %', 'Area (Hectares)']
-        for i, header in enumerate(headers):
-            header_cells[i].text = header
-            header_cells[i].paragraphs[0].runs[0].bold = True
-        
-        # Add high overlap conflict details
-        for _, row in high_overlap_conflicts.iterrows():
-            row_cells = table.add_row().cells
-            row_cells[0].text = str(row['id'])
-            row_cells[1].text = str(row['alt_id']) if pd.notna(row['alt_id']) else '-'
-            row_cells[2].text = str(row['country']) if pd.notna(row['country']) else '-'
-            row_cells[3].text = f"{row['percent_overlap']*100:.2f}%"
-            row_cells[4].text = format_number(row['hectares'])
-        
-        set_table_font(table)
+        add_source_table(doc, high_overlap_conflicts, CONFLICT_TABLE_HEADERS, get_conflict_columns,
+                         'percent_overlap', max_table_rows, appendix,
+                         ('High Overlap Conflicts', lambda: get_conflict_detail(high_overlap_conflicts)))
         doc.add_paragraph()
 
     # External Overlap Conflict Analysis
-    external_conflicts_df = df[df['is_internal'] == False]
+    external_conflicts_df = stats.external_conflicts_df
     if len(external_conflicts_df) > 0:
         doc.add_heading('External Overlap Conflict Analysis', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
         
@@ -332,146 +703,104 @@ def analyze_data(csv_path):
         doc.add_paragraph()
         
         # Create table for external conflicts
-        table = doc.add_table(rows=1, cols=5)
-        table.style = 'Table Grid'
-        header_cells = table.rows[0].cells
-        headers = ['Source ID', 'Alt ID', 'Country', 'Overlap %', 'Area (Hectares)']
-        for i, header in enumerate(headers):
-            header_cells[i].text = header
-            header_cells[i].paragraphs[0].runs[0].bold = True
-        
-        # Add external conflict details
-        for _, row in external_conflicts_df.iterrows():
-            row_cells = table.add_row().cells
-            row_cells[0].text = str(row['id'])
-            row_cells[1].text = str(row['alt_id']) if pd.notna(row['alt_id']) else '-'
-            row_cells[2].text = str(row['country']) if pd.notna(row['country']) else '-'
-            row_cells[3].text = f"{row['percent_overlap']*100:.2f}%"
-            row_cells[4].text = format_number(row['hectares'])
-        
-        set_table_font(table)
+        add_source_table(doc, external_conflicts_df, CONFLICT_TABLE_HEADERS, get_conflict_columns,
+                         'percent_overlap', max_table_rows, appendix,
+                         ('External Conflicts', lambda: get_conflict_detail(external_conflicts_df)))
         doc.add_paragraph()
 
     # Protected Areas Analysis by Country
     doc.add_heading('Protected Areas Analysis by Country', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
     
-    for country in sorted(df['country'].unique(), key=lambda x: str(x) if pd.notna(x) else ''):
-        if pd.isna(country):
-            continue
-            
-        # Filter out rows where both pa_name and pa_designation are NaN
-        country_pas = df[df['country'] == country][['pa_name', 'pa_designation']]
-        country_pas = country_pas.dropna(how='all')  # Remove rows where all values are NaN
-        country_pas = country_pas.drop_duplicates()
-        
+    for country in stats.countries:
         # Only create section if country has protected areas
-        if len(country_pas) > 0:
+        country_pas = stats.country_pas.get(country)
+        if country_pas is not None and len(country_pas) > 0:
             doc.add_heading(f'Protected Areas in {country}', level=2).runs[0].font.color.rgb = RGBColor(204, 0, 0)
             
-            table = doc.add_table(rows=1, cols=2)
-            table.style = 'Table Grid'
-            header_cells = table.rows[0].cells
-            headers = ['Protected Area Name', 'Designation']
-            for i, header in enumerate(headers):
-                header_cells[i].text = header
-                header_cells[i].paragraphs[0].runs[0].bold = True
-            
-            for _, row in country_pas.iterrows():
-                if pd.notna(row['pa_name']) or pd.notna(row['pa_designation']):  # Only add row if at least one value is not NaN
-                    row_cells = table.add_row().cells
-                    for i, value in enumerate([
-                        str(row['pa_name']) if pd.notna(row['pa_name']) else '-', 
-                        str(row['pa_designation']) if pd.notna(row['pa_designation']) else '-'
-                    ]):
-                        row_cells[i].text = value
-            
-            set_table_font(table)
+            # Rows where both values are missing were dropped in compute_report_stats()
+            add_bulk_table(doc, ['Protected Area Name', 'Designation'], [
+                text_or_dash(country_pas['pa_name']),
+                text_or_dash(country_pas['pa_designation']),
+            ])
             doc.add_paragraph()
 
     # Source Details with Protected Area Overlaps
     doc.add_heading('Source Details with Protected Area Overlaps', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
     
-    # Filter for sources with protected area overlaps
-    protected_sources = df[df['unep_overlap'] == True]
-    
-    for country in sorted(protected_sources['country'].unique(), key=lambda x: str(x) if pd.notna(x) else ''):
-        if pd.isna(country):
-            continue
-            
-        country_sources = protected_sources[protected_sources['country'] == country]
+    protected_countries = sort_countries(stats.protected_by_country)
+    # One appendix sheet for all countries, written when the first country table is cut
+    protected_detail = ('Protected Area Overlaps',
+                        lambda: get_protected_detail([stats.protected_by_country[c] for c in protected_countries]))
+    for country in protected_countries:
+        country_sources = stats.protected_by_country[country]
         if len(country_sources) > 0:
             doc.add_heading(f'Country: {country}', level=2).runs[0].font.color.rgb = RGBColor(204, 0, 0)
             
-            # Create table for source details
-            table = doc.add_table(rows=1, cols=4)
-            table.style = 'Table Grid'
-            header_cells = table.rows[0].cells
-            headers = ['Source ID', 'Alt ID', 'Protected Area', 'Area (Hectares)']
-            for i, header in enumerate(headers):
-                header_cells[i].text = header
-                header_cells[i].paragraphs[0].runs[0].bold = True
-            
-            # Add source details
-            for _, row in country_sources.iterrows():
-                row_cells = table.add_row().cells
-                row_cells[0].text = str(row['id'])
-                row_cells[1].text = str(row['alt_id']) if pd.notna(row['alt_id']) else '-'
-                row_cells[2].text = str(row['pa_name']) if pd.notna(row['pa_name']) else '-'
-                row_cells[3].text = format_number(row['hectares'])
-            
-            set_table_font(table)
+            # Create table for source details (largest sources first when cut)
+            add_source_table(doc, country_sources, ['Source ID', 'Alt ID', 'Protected Area', 'Area (Hectares)'],
+                             get_protected_columns, 'hectares', max_table_rows, appendix, protected_detail,
+                             rank_label='area')
             doc.add_paragraph()
 
     # Country Analysis
     doc.add_heading('Country Analysis', level=1).runs[0].font.color.rgb = RGBColor(204, 0, 0)
     
     # Get country-level statistics
-    for country in sorted(df['country'].unique(), key=lambda x: str(x) if pd.notna(x) else ''):
-        if pd.isna(country):
-            continue
-        
+    for country in stats.countries:
         # Get country data
-        country_data = df[df['country'] == country]
-        total_country_sources = len(country_data)
-        country_conflicts = len(country_data[country_data['conflict'] == True])
-        country_internal_conflicts = len(country_data[country_data['is_internal'] == True])
-        country_external_conflicts = country_conflicts - country_internal_conflicts
-        country_protected = len(country_data[country_data['unep_overlap'] == True])
+        country_stats = stats.by_country.loc[country]
+        total_country_sources = int(country_stats['total'])
+        country_conflicts = int(country_stats['conflicts'])
+        country_internal_conflicts = int(country_stats['internal'])
+        country_external_conflicts = int(country_stats['external'])
+        country_protected = int(country_stats['protected'])
         
         if total_country_sources > 0:
             doc.add_heading(f'Country: {country}', level=2).runs[0].font.color.rgb = RGBColor(204, 0, 0)
             
             # Create table
-            table = doc.add_table(rows=1, cols=6)
-            table.style = 'Table Grid'
-            
-            # Set headers
             headers = ['Total Sources', 'Total Conflicts', 'Internal Conflicts', 'External Conflicts', 'Sources With Protected Areas', 'Total Area (Hectares)']
-            for i, header in enumerate(headers):
-                table.rows[0].cells[i].text = header
-                table.rows[0].cells[i].paragraphs[0].runs[0].bold = True
-            
-            # Add row
-            row_cells = table.add_row().cells
-            row_cells[0].text = f"{total_country_sources:,}"
-            row_cells[1].text = f"{country_conflicts:,} ({(country_conflicts/total_country_sources)*100:.1f}%)"
-            row_cells[2].text = f"{country_internal_conflicts:,} ({(country_internal_conflicts/total_country_sources)*100:.1f}%)"
-            row_cells[3].text = f"{country_external_conflicts:,} ({(country_external_conflicts/total_country_sources)*100:.1f}%)"
-            row_cells[4].text = f"{country_protected:,} ({(country_protected/total_country_sources)*100:.1f}%)"
-            row_cells[5].text = format_number(country_data['hectares'].sum())
-            
-            set_table_font(table)
+            add_bulk_table(doc, headers, [
+                [f"{total_country_sources:,}"],
+                [f"{country_conflicts:,} ({(country_conflicts/total_country_sources)*100:.1f}%)"],
+                [f"{country_internal_conflicts:,} ({(country_internal_conflicts/total_country_sources)*100:.1f}%)"],
+                [f"{country_external_conflicts:,} ({(country_external_conflicts/total_country_sources)*100:.1f}%)"],
+                [f"{country_protected:,} ({(country_protected/total_country_sources)*100:.1f}%)"],
+                [format_number(country_stats['hectares'])],
+            ])
             doc.add_paragraph()
 
     # Save the document
-    output_filename = 'meti_ssid_registration_report.docx'
     doc.save(output_filename)
     print(f"Report generated: {output_filename}")
+    if appendix is not None:
+        appendix.close()
 
-if __name__ == "__main__":
-    csv_file = "sources_20251023_145659.csv"
-    
-    if not os.path.exists(csv_file):
-        print(f"Error: Could not find {csv_file}")
+def main():
+    parser = argparse.ArgumentParser(description="Generate METI SSID registration reports from a sources CSV.")
+    parser.add_argument('--csv', default="sources_20251023_145659.csv")
+    parser.add_argument('--custodian', default=DEFAULT_CUSTODIAN, help="Member named in a single report")
+    parser.add_argument('--output', default=REPORT_FILENAME, help="Output path of a single report")
+    parser.add_argument('--batch', action='store_true',
+                        help="One report per custodian in the CSV (or per --custodians) written to --output-dir")
+    parser.add_argument('--custodians', nargs='+', default=None, help="Limit --batch to these custodians")
+    parser.add_argument('--custodian-column', default='custodian')
+    parser.add_argument('--output-dir', default='reports')
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes rendering --batch reports")
+    parser.add_argument('--max-table-rows', type=positive_int, default=None,
+                        help="Cap per-source tables at this many rows and write the full tables to an appendix")
+    parser.add_argument('--appendix-format', choices=APPENDIX_FORMATS, default=None,
+                        help="Appendix for --max-table-rows (default: xlsx if xlsxwriter is installed, else csv)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"Error: Could not find {args.csv}")
+    elif args.batch:
+        generate_batch_reports(args.csv, args.output_dir, args.custodians, args.custodian_column, args.workers,
+                               args.max_table_rows, args.appendix_format)
     else:
-        analyze_data(csv_file) 
+        analyze_data(args.csv, args.custodian, args.output, args.max_table_rows, args.appendix_format)
+
+if __name__ == "__main__":
+    main()
+
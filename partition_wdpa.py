@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+
+from shapely.geometry import shape
+
+import check_overlap_UNEP_geojson as overlap
+
+WDPA_SHARD_DIR = "geojson/wdpa_shards"
+
+
+def get_shard_file(iso3):
+    """Shard file name for a WDPA ISO3 value; 'FRA;GUF' becomes FRA_GUF.geojsonl."""
+    return ('_'.join(overlap.split_iso3(iso3)) or '_none') + '.geojsonl'
+
+def merge_bbox(bbox, other):
+    if bbox is None:
+        return list(other)
+    return [min(bbox[0], other[0]), min(bbox[1], other[1]), max(bbox[2], other[2]), max(bbox[3], other[3])]
+
+def partition_wdpa(wdpa_file, shard_dir=WDPA_SHARD_DIR):
+    """Split WDPA into one GeoJSONSeq shard per ISO3 value, plus an index.json header.
+
+    Every feature keeps its properties and geometry and gains a bbox member
+    and its position in the source file (wdpa_seq). Transboundary areas
+    ('FRA;GUF') get their own shard, listed under each of their countries in
+    the index, so they are stored once and loaded for any of them. The index
+    records each shard's file, countries, feature count and bbox, and the
+    SHA-256 of the source file so the PA index cache needs no rehash.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    print(f"Hashing {wdpa_file}...")
+    source_hash = overlap.hash_file(wdpa_file)
+    files, shards = {}, {}
+    total = 0
+    try:
+        for seq, feature in enumerate(overlap.iter_geojson_features(wdpa_file)):
+            iso3 = feature.get('properties', {}).get('ISO3') or ''
+            try:
+                bbox = list(shape(feature['geometry']).bounds)
+            except Exception:
+                bbox = None
+            if iso3 not in shards:
+                shards[iso3] = {'iso3': iso3, 'countries': overlap.split_iso3(iso3),
+                                'file': get_shard_file(iso3), 'features': 0, 'bbox': None}
+                files[iso3] = open(os.path.join(shard_dir, shards[iso3]['file']), 'w')
+            shard = shards[iso3]
+            shard['features'] += 1
+            if bbox:
+                shard['bbox'] = merge_bbox(shard['bbox'], bbox)
+                feature['bbox'] = bbox
+            feature['wdpa_seq'] = seq
+            files[iso3].write(json.dumps(overlap.to_jsonable(feature)) + '\n')
+            total += 1
+            if total % 10000 == 0:
+                print(f"Partitioned {total} features into {len(shards)} shards")
+    finally:
+        for f in files.values():
+            f.close()
+
+    index = {
+        'source': os.path.abspath(wdpa_file),
+        'source_sha256': source_hash,
+        'features': total,
+        'shards': sorted(shards.values(), key=lambda s: s['iso3']),
+    }
+    with open(os.path.join(shard_dir, overlap.PA_SHARD_INDEX), 'w') as f:
+        json.dump(index, f, indent=2)
+    print(f"Wrote {total} features to {len(shards)} shards in {shard_dir}")
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition WDPA into per-ISO3 GeoJSONSeq shards.")
+    parser.add_argument('--protected-areas', default="geojson/WDPA_Mar2025_Public_merged_polygons.geojson")
+    parser.add_argument('--output-dir', default=WDPA_SHARD_DIR)
+    args = parser.parse_args()
+    partition_wdpa(args.protected_areas, args.output_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+
+import check_overlap_UNEP_geojson as overlap
+import check_source_conflicts as conflicts
+import generate_meti_report as report
+
+# Overlap result columns the report reads, under their report names
+OVERLAP_REPORT_COLUMNS = {
+    'PA_NAME': 'pa_name',
+    'PA_DESIG_ENG': 'pa_designation',
+    'unep_overlap': 'unep_overlap',
+}
+SOURCES_OUTPUT_COLUMNS = conflicts.CONFLICT_COLUMNS + list(OVERLAP_REPORT_COLUMNS.values())
+
+
+def build_sources_frame(conflict_df, overlap_df):
+    """Join per-source conflict rows with their protected-area overlap, on feature idx.
+
+    Both frames come from the same ProjectTable, so the join needs no ids.
+    Sources whose overlap check failed keep an empty unep_overlap.
+    """
+    pa = overlap_df[list(OVERLAP_REPORT_COLUMNS)].rename(columns=OVERLAP_REPORT_COLUMNS)
+    pa = pa[~pa.index.duplicated()]
+    return conflict_df.join(pa, how='left')[SOURCES_OUTPUT_COLUMNS]
+
+def run_pipeline(sources_file, protected_areas, custodian=report.DEFAULT_CUSTODIAN, output=report.REPORT_FILENAME,
+                 batch=False, custodians=None, output_dir='reports', custodian_property='custodian',
+                 cache_dir=overlap.PA_CACHE_DIR, workers=1, sources_output=None, spill_dir=None,
+                 max_table_rows=None, appendix_format=None):
+    """Conflicts, PA overlaps and the report(s) for one sources file, in one process.
+
+    The sources are ingested once and shared by both checks; their results
+    go to the report as DataFrames, with no intermediate CSV. A single
+    report is built from the rows of that custodian only.
+    """
+    sources = overlap.ingest_projects(sources_file, spill_dir, properties=('alt_id', custodian_property))
+    if not batch and custodian not in set(sources.properties[custodian_property]):
+        found = sorted({str(c) for c in sources.properties[custodian_property] if c is not None})
+        raise ValueError(f"No sources for custodian {custodian!r}; found {found}")
+    conflict_df = conflicts.check_source_conflicts(sources, None, custodian_property=custodian_property,
+                                                   workers=workers)
+    overlap_df = overlap.check_overlaps(sources, protected_areas, cache_dir=cache_dir, workers=workers)
+    df = build_sources_frame(conflict_df, overlap_df)
+    if sources_output:
+        if sources_output.endswith('.parquet'):
+            df.to_parquet(sources_output, index=False)
+        else:
+            df.to_csv(sources_output, index=False)
+        print(f"Sources saved to: {sources_output}")
+
+    if batch:
+        return report.generate_batch_reports(df, output_dir, custodians, 'custodian', workers,
+                                             max_table_rows, appendix_format)
+    # The sources hold every custodian (for external conflicts); the report covers only one
+    stats = report.compute_custodian_stats(report.load_report_data(df, {'custodian': 'category'}))
+    report.build_report(stats[custodian], custodian, output, max_table_rows, appendix_format)
+    return [output]
+
+def main():
+    parser = argparse.ArgumentParser(description="Check sources for conflicts and PA overlaps, then write METI reports.")
+    parser.add_argument('--sources', default="sources_20251022_195516.geojson")
+    parser.add_argument('--protected-areas', default="geojson/WDPA_Mar2025_Public_merged_polygons.geojson",
+                        help="WDPA GeoJSON file, or a shard directory written by partition_wdpa.py")
+    parser.add_argument('--custodian', default=report.DEFAULT_CUSTODIAN, help="Member named in a single report")
+    parser.add_argument('--output', default=report.REPORT_FILENAME, help="Output path of a single report")
+    parser.add_argument('--batch', action='store_true', help="One report per custodian, written to --output-dir")
+    parser.add_argument('--custodians', nargs='+', default=None, help="Limit --batch to these custodians")
+    parser.add_argument('--output-dir', default='reports')
+    parser.add_argument('--custodian-property', default='custodian',
+                        help="Feature property naming the custodian; equal custodians make a conflict internal")
+    parser.add_argument('--cache-dir', default=overlap.PA_CACHE_DIR,
+                        help="Directory for the prebuilt protected-area index (keyed by WDPA file hash)")
+    parser.add_argument('--no-cache', action='store_true', help="Always re-parse the WDPA file")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes for both checks and for --batch reports")
+    parser.add_argument('--sources-output', default=None,
+                        help="Also save the joined sources table the report is built from (CSV, or Parquet by extension)")
+    parser.add_argument('--max-table-rows', type=report.positive_int, default=None,
+                        help="Cap per-source report tables at this many rows and write the full tables to an appendix")
+    parser.add_argument('--appendix-format', choices=report.APPENDIX_FORMATS, default=None,
+                        help="Appendix for --max-table-rows (default: xlsx if xlsxwriter is installed, else csv)")
+    parser.add_argument('--json-backend', choices=overlap.JSON_BACKENDS, default=overlap.JSON_BACKEND)
+    parser.add_argument('--spill-dir', default=None,
+                        help="Spill ingested geometries to a memory-mapped file in this directory")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.sources):
+        print(f"Error: Could not find {args.sources}")
+        return
+    overlap.JSON_BACKEND = args.json_backend
+    run_pipeline(args.sources, args.protected_areas, args.custodian, args.output, args.batch, args.custodians,
+                 args.output_dir, args.custodian_property, None if args.no_cache else args.cache_dir,
+                 args.workers, args.sources_output, args.spill_dir, args.max_table_rows, args.appendix_format)
+
+if __name__ == "__main__":
+    main()